@@ -1,6 +1,10 @@
 import os
-from groq import Groq
 from typing import Literal
+from src.utils.cache import PersistentCache, make_key
+from src.agent.local_classifier import LocalIntentClassifier
+from src.agent.llm_gateway import LLMGateway
+from src.agent.model_scheduler import SMALL_MODEL
+from src.utils.tracing import annotate
 
 IntentType = Literal["search", "chat", "unknown"]
 
@@ -9,12 +13,26 @@ class IntentRouter:
         api_key = os.getenv("GROQ_API_KEY")
         if not api_key:
             raise ValueError("GROQ_API_KEY not found.")
-        self.client = Groq(api_key=api_key)
+        self.llm = LLMGateway.get_instance()
+        self.cache = PersistentCache.get_instance()
+        # Zero-latency fast path; set TINKER_LOCAL_INTENT=false to always ask the LLM
+        self.local = None
+        if os.getenv("TINKER_LOCAL_INTENT", "true").lower() == "true":
+            self.local = LocalIntentClassifier(
+                threshold=float(os.getenv("TINKER_LOCAL_INTENT_THRESHOLD", "0.85"))
+            )
 
     def classify(self, message: str) -> IntentType:
         """
         Classifies the user message into an intent.
+        Confident local predictions skip the Groq round-trip entirely.
         """
+        if self.local:
+            intent = self.local.classify(message)
+            if intent:
+                annotate(source="local")
+                return intent
+
         prompt = f"""
         Classify the intent of the following user message sent to a bot named 'Tinker'.
         
@@ -28,15 +46,24 @@ class IntentRouter:
         Respond ONLY with the intent label (search, chat, unknown). Do not add punctuation or explanation.
         """
         
+        # Temperature 0 makes the answer a pure function of the prompt, so repeats are free
+        cache_key = make_key("intent", SMALL_MODEL, prompt)
+        cached = self.cache.get(cache_key)
+        if cached:
+            annotate(source="cache")
+            return cached
+
+        annotate(source="llm")
         try:
-            completion = self.client.chat.completions.create(
-                model="llama3-8b-8192",
+            completion = self.llm.chat(
+                model=SMALL_MODEL,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.0,
                 max_tokens=10
             )
             intent = completion.choices[0].message.content.strip().lower()
             if intent in ["search", "chat", "unknown"]:
+                self.cache.set(cache_key, intent)
                 return intent
             return "unknown"
         except Exception as e:
@@ -0,0 +1,314 @@
+import os
+import time
+import random
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from groq import Groq
+from src.agent.prompt_builder import count_message_tokens
+from src.agent.task_budget import BudgetExceeded, current_budget
+from src.utils.tracing import span, annotate
+from src.utils import metrics
+
+try:
+    # Only needed for the optional OpenAI-compatible fallback (OpenRouter, a local llama.cpp/vLLM server...)
+    from openai import OpenAI
+except ImportError:
+    OpenAI = None
+
+# Groq's free-tier limits are per model: (requests/min, tokens/min). Models not listed
+# use GROQ_RPM / GROQ_TPM; GROQ_MODEL_LIMITS="model=rpm:tpm,..." overrides entries.
+GROQ_MODEL_LIMITS = {
+    "llama3-8b-8192": (30, 30000),
+    "llama3-70b-8192": (30, 6000),
+    "mixtral-8x7b-32768": (30, 5000),
+    "gemma-7b-it": (30, 15000),
+}
+
+
+def parse_model_limits(value: str) -> dict:
+    limits = {}
+    for entry in filter(None, (e.strip() for e in (value or "").split(","))):
+        try:
+            model, rates = entry.split("=", 1)
+            rpm, tpm = rates.split(":", 1)
+            limits[model.strip()] = (int(rpm), int(tpm))
+        except ValueError:
+            print(f"[LLM] Ignoring malformed model limit '{entry}' (expected model=rpm:tpm)")
+    return limits
+
+
+class TokenBucket:
+    """Thread-safe token bucket holding up to `capacity` tokens, refilled evenly over a minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0, max_wait: float = None):
+        """
+        Blocks the calling thread until `amount` tokens are available, then takes them.
+        Raises BudgetExceeded straight away if that would take longer than `max_wait` seconds.
+        """
+        amount = min(amount, self.capacity)
+        deadline = time.monotonic() + max_wait if max_wait is not None else None
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait_s = (amount - self._tokens) / self.rate
+            if deadline is not None and time.monotonic() + wait_s > deadline:
+                raise BudgetExceeded(f"rate limit wait of {wait_s:.1f}s exceeds the task's remaining time")
+            time.sleep(wait_s)
+
+
+class StartedStream:
+    """
+    A chunk stream whose first chunk was already read: the call only counts as
+    answered (for retries, hedging and latency) once content starts flowing.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._chunks = iter(stream)
+        self.first = next(self._chunks, None)
+
+    def __iter__(self):
+        if self.first is not None:
+            yield self.first
+        yield from self._chunks
+
+    def close(self):
+        close = getattr(self.stream, "close", None)
+        if close is not None:
+            close()
+
+
+class Provider:
+    """One pooled client plus per-model request/token limiters."""
+
+    def __init__(self, name: str, client, rpm: int, tpm: int, model: str = None, model_limits: dict = None):
+        self.name = name
+        self.client = client
+        # Defaults for models without their own entry in `model_limits`
+        self.rpm = rpm
+        self.tpm = tpm
+        self.model_limits = model_limits or {}
+        # Fallback providers serve every request with their own model
+        self.model = model
+        self._limits = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, model: str) -> str:
+        return self.model or model
+
+    def limits_for(self, model: str) -> tuple:
+        """(requests/min, tokens/min) allowed for a model."""
+        return self.model_limits.get(model, (self.rpm, self.tpm))
+
+    def throttle(self, model: str, tokens: int, max_wait: float = None):
+        with self._lock:
+            limits = self._limits.get(model)
+            if limits is None:
+                rpm, tpm = self.limits_for(model)
+                limits = (TokenBucket(rpm), TokenBucket(tpm))
+                self._limits[model] = limits
+        limits[0].acquire(1, max_wait)
+        limits[1].acquire(tokens, max_wait)
+
+
+class LLMGateway:
+    """
+    Single entry point for chat completions.
+
+    - One pooled client per provider (Groq first, optional OpenAI-compatible fallback
+      configured via LLM_FALLBACK_BASE_URL / LLM_FALLBACK_API_KEY / LLM_FALLBACK_MODEL).
+    - Request and token buckets per model, sized to that model's free-tier limits
+      (GROQ_MODEL_LIMITS; GROQ_RPM / GROQ_TPM for other models).
+    - Exponential backoff with jitter on 429s, 5xx and connection errors (LLM_MAX_RETRIES),
+      honouring Retry-After when the provider sends it.
+    - Optional hedging: if the primary hasn't answered within LLM_HEDGE_AFTER_S, the same
+      request also goes to the fallback and the first answer wins. Failures fail over too.
+      Streams are hedged up to their first chunk; the losing stream is closed.
+    - Per provider/model request, error, retry, hedge, token and latency metrics
+      (src/utils/metrics.py). Streams are timed to their first chunk, in their own histogram.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        self.max_retries = int(os.getenv("LLM_MAX_RETRIES", "3"))
+        self.hedge_after = float(os.getenv("LLM_HEDGE_AFTER_S", "0")) or None
+        timeout = float(os.getenv("LLM_TIMEOUT_S", "60"))
+
+        self.primary = Provider(
+            "groq",
+            # Retries are handled here, so the SDK's own are disabled
+            Groq(api_key=os.getenv("GROQ_API_KEY"), max_retries=0, timeout=timeout),
+            rpm=int(os.getenv("GROQ_RPM", "30")),
+            tpm=int(os.getenv("GROQ_TPM", "6000")),
+            model_limits={**GROQ_MODEL_LIMITS, **parse_model_limits(os.getenv("GROQ_MODEL_LIMITS"))},
+        )
+        self.fallback = None
+        base_url = os.getenv("LLM_FALLBACK_BASE_URL")
+        if base_url:
+            if OpenAI is None:
+                print("[LLM] LLM_FALLBACK_BASE_URL is set but the 'openai' package is not installed; fallback disabled.")
+            else:
+                self.fallback = Provider(
+                    "fallback",
+                    OpenAI(base_url=base_url, api_key=os.getenv("LLM_FALLBACK_API_KEY", "none"), max_retries=0, timeout=timeout),
+                    rpm=int(os.getenv("LLM_FALLBACK_RPM", "60")),
+                    tpm=int(os.getenv("LLM_FALLBACK_TPM", "100000")),
+                    model=os.getenv("LLM_FALLBACK_MODEL", "llama3"),
+                )
+        self._hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="tinker-llm")
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = LLMGateway()
+        return cls._instance
+
+    def chat(self, model: str, messages: list, **kwargs):
+        """
+        Blocking chat completion with the same arguments and return type as the Groq SDK
+        (`stream=True` returns an iterator of chunks). Run it off the event loop.
+        `deadline` (a time.monotonic() value) bounds this call, rate-limit waits included.
+        """
+        if not self.fallback:
+            return self._call(self.primary, model, messages, **kwargs)
+        return self._hedged(model, messages, **kwargs)
+
+    def _hedged(self, model: str, messages: list, **kwargs):
+        # Hedge threads run in a copy of the caller's context so they see its task budget
+        futures = [self._hedge_pool.submit(contextvars.copy_context().run, self._call, self.primary, model, messages, **kwargs)]
+        done, _ = wait(futures, timeout=self.hedge_after)
+        failed = bool(done) and futures[0].exception() is not None
+        if not done or failed:
+            # Primary is slow (or already failed): race the fallback against it
+            if failed:
+                print("[LLM] Primary provider failed, failing over.")
+            self._record(self.fallback.name, self.fallback.resolve(model), hedged=True)
+            futures.append(self._hedge_pool.submit(contextvars.copy_context().run, self._call, self.fallback, model, messages, **kwargs))
+
+        error = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.add_done_callback(self._close_loser)
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    @staticmethod
+    def _close_loser(future):
+        # A hedged stream that lost the race would otherwise keep its connection open
+        if not future.cancelled() and future.exception() is None and isinstance(future.result(), StartedStream):
+            future.result().close()
+
+    def _call(self, provider: Provider, model: str, messages: list, **kwargs):
+        # For streams the span covers the time until the first chunk; see the caller's llm.stream span for the rest
+        with span("llm.call", provider=provider.name, model=provider.resolve(model), stream=bool(kwargs.get("stream"))):
+            return self._call_with_retries(provider, model, messages, **kwargs)
+
+    def _call_with_retries(self, provider: Provider, model: str, messages: list, **kwargs):
+        target = provider.resolve(model)
+        tokens = count_message_tokens(messages) + kwargs.get("max_tokens", 512)
+        budget = current_budget.get()
+        # Optional monotonic deadline for this call alone (e.g. a tool's own timeout)
+        deadline = kwargs.pop("deadline", None)
+        delay = 0.5
+        for attempt in range(self.max_retries + 1):
+            if budget is not None:
+                budget.check()
+            if deadline is not None and time.monotonic() >= deadline:
+                raise BudgetExceeded("call deadline passed")
+            # A rate-limit wait counts against the task's deadline too
+            provider.throttle(target, tokens, max_wait=self._time_left(budget, deadline))
+            left = self._time_left(budget, deadline)
+            if left is not None:
+                # Never let one call outlive the task it belongs to
+                if budget is not None:
+                    budget.check()
+                kwargs["timeout"] = min(kwargs.get("timeout") or left, left)
+            start = time.monotonic()
+            try:
+                result = provider.client.chat.completions.create(model=target, messages=messages, **kwargs)
+                if kwargs.get("stream"):
+                    result = StartedStream(result)
+            except Exception as e:
+                self._record(provider.name, target, error=True)
+                if attempt == self.max_retries or not self._retryable(e):
+                    raise
+                wait_s = self._retry_after(e) or delay * (2 ** attempt) * random.uniform(0.8, 1.2)
+                left = self._time_left(budget, deadline)
+                if left is not None and wait_s >= left:
+                    raise
+                print(f"[LLM] {provider.name}/{target} failed ({e.__class__.__name__}), retrying in {wait_s:.1f}s")
+                self._record(provider.name, target, retry=True)
+                time.sleep(wait_s)
+                continue
+            usage = getattr(result, "usage", None)
+            used = getattr(usage, "total_tokens", 0) or 0
+            self._record(provider.name, target, latency_ms=(time.monotonic() - start) * 1000, tokens=used,
+                         first_chunk=bool(kwargs.get("stream")))
+            annotate(attempts=attempt + 1, tokens=used)
+            if budget is not None:
+                # Streams report no usage up front: charge the prompt now, the caller adds the output
+                budget.charge_tokens(used or count_message_tokens(messages))
+            return result
+
+    @staticmethod
+    def _time_left(budget, deadline: float = None):
+        """Seconds until the task budget or the call's own deadline runs out, whichever is first."""
+        left = [budget.remaining()] if budget is not None else []
+        if deadline is not None:
+            left.append(deadline - time.monotonic())
+        return min(left) if left else None
+
+    @staticmethod
+    def _retryable(e: Exception) -> bool:
+        status = getattr(e, "status_code", None)
+        if status is not None:
+            return status == 429 or status >= 500
+        return e.__class__.__name__ in ("APIConnectionError", "APITimeoutError")
+
+    @staticmethod
+    def _retry_after(e: Exception):
+        response = getattr(e, "response", None)
+        value = response.headers.get("retry-after") if response is not None else None
+        try:
+            return min(float(value), 30.0) if value else None
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _record(provider: str, model: str, latency_ms: float = None, tokens: int = 0,
+                error: bool = False, retry: bool = False, hedged: bool = False, first_chunk: bool = False):
+        """`first_chunk` marks a stream's latency, which is only the time until content started."""
+        labels = {"provider": provider, "model": model}
+        if error:
+            metrics.LLM_ERRORS.inc(**labels)
+        if retry:
+            metrics.LLM_RETRIES.inc(**labels)
+        if hedged:
+            metrics.LLM_HEDGES.inc(**labels)
+        if latency_ms is not None:
+            metrics.LLM_REQUESTS.inc(**labels)
+            if tokens:
+                metrics.LLM_TOKENS.inc(tokens, **labels)
+            histogram = metrics.LLM_FIRST_CHUNK_SECONDS if first_chunk else metrics.LLM_SECONDS
+            histogram.observe(latency_ms / 1000, **labels)
@@ -0,0 +1,136 @@
+import re
+import math
+import zlib
+from typing import Optional
+
+# A tiny on-device intent model in front of the Groq classifier.
+# Obvious cases are answered by rules; the rest go through a hashed n-gram
+# logistic regression trained (in a few milliseconds, on first use) from the
+# seed examples below. Anything it isn't confident about returns None, and
+# IntentRouter falls back to the LLM.
+
+N_FEATURES = 1 << 12
+
+CHAT_RULES = re.compile(
+    r"^(hi+|hey+|hello+|yo|sup|hiya|howdy|gm|good (morning|afternoon|evening|night)|"
+    r"thanks?( you)?( so much| a lot)?|thx|ty|tysm|cheers|cool|nice|great|awesome|ok(ay)?|k|"
+    r"lol|lmao|haha+|bye|goodbye|see ya|later|gn|np|no worries|you rock|love you|"
+    r"how are you( doing)?|what'?s up|wassup|who are you|what are you)"
+    r"( tinker)?[\s!.?😊🙏👍❤️]*$",
+    re.IGNORECASE,
+)
+SEARCH_RULES = re.compile(
+    r"(https?://|www\.|\b[\w-]+\.(com|org|net|io|dev|ai|co|gov|edu)\b|"
+    r"^(please )?(search|find|look up|lookup|google|go to|navigate|open|browse|visit|summari[sz]e|"
+    r"compare|check|fetch|get me|show me|sign me up|fill|click|remember|recall)\b)",
+    re.IGNORECASE,
+)
+
+SEED_EXAMPLES = {
+    "chat": [
+        "hi", "hello there", "hey tinker", "good morning", "thanks!", "thank you so much",
+        "thanks for the help", "you're awesome", "lol that's funny", "how are you today",
+        "what's up", "nice one", "cool thanks", "good night", "see you later", "bye",
+        "that was helpful", "great job", "appreciate it", "nevermind", "no worries",
+        "haha nice", "you are the best", "i'm bored", "tell me a joke", "how's it going",
+        "ok got it", "sounds good", "perfect thanks", "yo tinker", "hey buddy",
+        "have a nice day", "happy friday", "i love you tinker", "that's hilarious",
+        "sorry my bad", "wow", "amazing work", "thank you!", "you're welcome",
+        "good afternoon", "what is your name", "who made you", "are you a bot",
+        "hey how are you doing", "that's all for now", "talk to you later", "gm everyone",
+    ],
+    "search": [
+        "find the cheapest rtx 4090 on amazon", "what is the weather in london",
+        "search for the latest spacex launch", "who won the game last night",
+        "summarize the top hn posts today", "look up flights to tokyo",
+        "what are the best laptops under 1000", "go to example.com and sign me up",
+        "compare iphone 15 and pixel 8 prices", "what's the price of bitcoin",
+        "how do i install python on windows", "latest news about openai",
+        "when does the next apple event start", "find me a recipe for lasagna",
+        "what time is it in new york", "check the status of github",
+        "summarize this article", "who is the ceo of microsoft", "translate hello to french",
+        "how tall is mount everest", "what is the capital of australia",
+        "open the python docs", "get the top posts from reddit", "book a table for two",
+        "sign me up for the newsletter", "fill out the form on that page",
+        "remember that i live in san francisco", "what is my favorite color",
+        "how much does a tesla model 3 cost", "find reviews for the new macbook",
+        "what movies are playing tonight", "show me the stock price of nvidia",
+        "research the history of rome", "list the best restaurants near me",
+        "what's trending on twitter", "download the report from the website",
+        "is the store open on sunday", "explain quantum computing with sources",
+        "where can i buy a ps5", "how many people live in canada",
+        "give me the latest score", "find jobs for python developers",
+        "what does the documentation say about async", "track my package",
+        "who wrote the great gatsby", "what is the population of india",
+        "now find a cheaper one on ebay", "do it again but for eu prices",
+    ],
+}
+
+
+def _features(text: str) -> dict:
+    """Hashed word unigrams/bigrams and character trigrams -> counts."""
+    text = text.lower().strip()
+    words = re.findall(r"[\w']+", text)
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    padded = f" {text} "
+    grams += [f"#{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    feats = {}
+    for g in grams:
+        idx = zlib.crc32(g.encode("utf-8")) % N_FEATURES
+        feats[idx] = feats.get(idx, 0.0) + 1.0
+    # L2 normalize so long messages don't get extreme scores
+    norm = math.sqrt(sum(v * v for v in feats.values())) or 1.0
+    return {k: v / norm for k, v in feats.items()}
+
+
+class LocalIntentClassifier:
+    """
+    Rules + hashed n-gram logistic regression; `classify` returns None when unsure.
+    Sending a task to plain chat loses the tools, so "chat" needs more confidence than "search".
+    """
+
+    def __init__(self, threshold: float = 0.85, chat_threshold: float = 0.95):
+        self.threshold = threshold
+        self.chat_threshold = chat_threshold
+        self._weights = None
+        self._bias = 0.0
+
+    def _train(self, epochs: int = 30, lr: float = 0.5, l2: float = 1e-4):
+        # Binary logistic regression: p(search | message)
+        weights = [0.0] * N_FEATURES
+        bias = 0.0
+        data = [(_features(text), 1.0 if label == "search" else 0.0)
+                for label, texts in SEED_EXAMPLES.items() for text in texts]
+        for _ in range(epochs):
+            for feats, y in data:
+                z = bias + sum(weights[i] * v for i, v in feats.items())
+                err = 1.0 / (1.0 + math.exp(-z)) - y
+                for i, v in feats.items():
+                    weights[i] -= lr * (err * v + l2 * weights[i])
+                bias -= lr * err
+        self._weights = weights
+        self._bias = bias
+
+    def predict_proba(self, message: str) -> float:
+        """Probability that the message is a 'search' (task) request."""
+        if self._weights is None:
+            self._train()
+        z = self._bias + sum(self._weights[i] * v for i, v in _features(message).items())
+        return 1.0 / (1.0 + math.exp(-z))
+
+    def classify(self, message: str) -> Optional[str]:
+        text = message.strip()
+        if not text:
+            return "chat"
+        if SEARCH_RULES.search(text):
+            return "search"
+        if CHAT_RULES.match(text):
+            return "chat"
+
+        p_search = self.predict_proba(text)
+        if p_search >= self.threshold:
+            return "search"
+        if 1.0 - p_search >= self.chat_threshold and len(text.split()) <= 8:
+            # Only trust "chat" on short messages; long ones are usually tasks
+            return "chat"
+        return None
@@ -0,0 +1,78 @@
+import os
+import re
+from src.agent.tool_registry import registry
+from src.utils import metrics
+
+# The one place that decides which models Tinker runs on
+SMALL_MODEL = os.getenv("TINKER_SMALL_MODEL", "llama3-8b-8192") # Routine steps, chat, routing, summaries
+LARGE_MODEL = os.getenv("TINKER_LARGE_MODEL", "llama3-70b-8192") # Planning, recovery and final answers
+
+# Answers that hedge like this get a second opinion from the large model
+LOW_CONFIDENCE = re.compile(r"\b(i'?m not sure|not certain|i don'?t know|i cannot determine|unclear)\b", re.IGNORECASE)
+# Characters of a small-model answer checked for hedging before it starts streaming
+CONFIDENCE_WINDOW = 120
+
+
+class ModelScheduler:
+    """
+    Picks the model for each agent step.
+
+    - The first step plans the task, so it runs on the large model.
+    - Follow-up steps (picking the next tool after one succeeded) run on the small model.
+    - The next step escalates to the large model after a failed tool call.
+    - A small-model step is re-run on the large model when its output can't be parsed,
+      names an unknown tool, or answers the task: the large model writes final answers.
+      To save large-model calls, TINKER_FINAL_ON_LARGE=0 keeps confident small-model
+      answers (streamed once their opening shows no hedging) and only re-runs hedging ones.
+
+    TINKER_MODEL_TIERING=0 runs every step on the large model.
+    """
+
+    def __init__(self, small: str = SMALL_MODEL, large: str = LARGE_MODEL,
+                 enabled: bool = None, final_on_large: bool = None):
+        self.small = small
+        self.large = large
+        self.enabled = enabled if enabled is not None else os.getenv("TINKER_MODEL_TIERING", "1") != "0"
+        self.final_on_large = (final_on_large if final_on_large is not None
+                               else os.getenv("TINKER_FINAL_ON_LARGE", "1") != "0")
+
+    def pick(self, step: int, escalate: bool = False) -> str:
+        """Model for step `step` (0-based); `escalate` after the previous step went wrong."""
+        model = self.large if not self.enabled or step == 0 or escalate else self.small
+        metrics.MODEL_STEPS.inc(tier="large" if model == self.large else "small")
+        return model
+
+    def is_small(self, model: str) -> bool:
+        return model != self.large
+
+    def can_stream(self, model: str, partial_answer: str) -> bool:
+        """
+        Whether a final answer being written by `model` can start reaching the user.
+        Large-model answers always can; small-model ones only when they are kept
+        (TINKER_FINAL_ON_LARGE=0) and their opening doesn't hedge.
+        """
+        if not self.is_small(model):
+            return True
+        if self.final_on_large:
+            return False
+        return len(partial_answer) >= CONFIDENCE_WINDOW and not LOW_CONFIDENCE.search(partial_answer)
+
+    def needs_large(self, answer: str, actions: list) -> bool:
+        """
+        Whether a small-model step should be re-run on the large model.
+        `answer` is the final answer if the step gave one (else None), `actions` the
+        (tool_name, tool_input) pairs it requested.
+        """
+        if answer is not None:
+            escalate = self.final_on_large or bool(LOW_CONFIDENCE.search(answer))
+        else:
+            escalate = not actions or any(registry.get_tool(name) is None for name, _ in actions)
+        if escalate:
+            metrics.MODEL_ESCALATIONS.inc()
+            metrics.MODEL_STEPS.inc(tier="large")
+        return escalate
+
+    @staticmethod
+    def failed(observations: list) -> bool:
+        """Whether any tool call in a step errored (or named an unknown tool)."""
+        return any(str(obs).startswith(("Error", "Tool '")) for obs in observations)
@@ -0,0 +1,192 @@
+import os
+import logging
+from src.utils.cache import PersistentCache, make_key
+
+logger = logging.getLogger(__name__)
+
+# Llama-3 averages ~4 characters per token on English text; close enough for budgeting
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+def count_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def count_message_tokens(messages: list) -> int:
+    total = 0
+    for m in messages:
+        total += count_tokens(m.get("content") or "") + MESSAGE_OVERHEAD_TOKENS
+        for call in m.get("tool_calls") or []:
+            total += count_tokens(call["function"]["name"] + call["function"]["arguments"])
+    return total
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    return text[:limit] + " ...[truncated]"
+
+def clean_history(history: list) -> list:
+    """Keeps only user/assistant turns in Groq message format."""
+    return [
+        {"role": msg["role"], "content": msg["content"]}
+        for msg in history or []
+        if msg["role"] in ["user", "assistant"]
+    ]
+
+
+def _transcript(turns: list) -> str:
+    return "\n".join(f"{t['role']}: {t['content']}" for t in turns)
+
+def _gist(turns: list) -> str:
+    return " | ".join(f"{t['role']}: {truncate_tokens(t['content'], 40)}" for t in turns)
+
+def format_observations(parts: list) -> str:
+    """Joins a fan-out step's (tool_name, output) results into one observation."""
+    return "\n\n".join(f"[{n}] {tool_name}: {obs}" for n, (tool_name, obs) in enumerate(parts, 1))
+
+def fit_observations(parts: list, max_tokens: int) -> list:
+    """
+    Shares `max_tokens` across (tool_name, output) results: short ones stay whole,
+    the rest are cut to an equal share of what's left, so every result keeps some room.
+    """
+    sizes = sorted(count_tokens(obs) for _, obs in parts)
+    share, left = max_tokens, len(sizes)
+    for size in sizes:
+        share = max_tokens // left
+        if size > share:
+            break
+        max_tokens -= size
+        left -= 1
+    return [(name, truncate_tokens(obs, max(share, 50))) for name, obs in parts]
+
+
+class PromptBuilder:
+    """
+    Assembles LLM prompts under a per-request token budget.
+
+    - Conversation history keeps the last `recent_turns` turns verbatim; older turns are
+      rolled into a short summary (LLM-written when long, cached by content hash).
+    - In the ReAct transcript each result of the latest step keeps up to `observation_tokens`
+      (a fan-out step's results are capped one by one); older ones shrink to
+      `stale_observation_tokens`, since the model already acted on them.
+    - If the result still exceeds `budget_tokens`, history and the summary are dropped
+      oldest-first, then the latest step's results are cut down to share what's left.
+    """
+
+    def __init__(self, budget_tokens: int = None, recent_turns: int = 4,
+                 observation_tokens: int = 500, stale_observation_tokens: int = 80,
+                 summary_threshold_tokens: int = 400, summarize=None):
+        self.budget_tokens = budget_tokens or int(os.getenv("TINKER_PROMPT_BUDGET", "6000"))
+        self.recent_turns = recent_turns
+        self.observation_tokens = observation_tokens
+        self.stale_observation_tokens = stale_observation_tokens
+        self.summary_threshold_tokens = summary_threshold_tokens
+        # Blocking callable(text) -> summary; without one, old turns are compacted extractively
+        self.summarize = summarize
+        self.cache = PersistentCache.get_instance()
+
+    def compact_history(self, history: list, recent_turns: int = None) -> list:
+        """
+        Returns history as messages: an optional summary of older turns, then the recent ones.
+        May call the summarizer, so run it off the event loop.
+        """
+        turns = clean_history(history)
+        recent_turns = recent_turns or self.recent_turns
+        old, recent = turns[:-recent_turns], turns[-recent_turns:]
+        if not old:
+            return recent
+        summary = self._summarize_turns(old)
+        return [{"role": "system", "content": f"Summary of the earlier conversation: {summary}"}] + recent
+
+    def _summarize_turns(self, turns: list) -> str:
+        transcript = _transcript(turns)
+        if count_tokens(transcript) <= self.summary_threshold_tokens or not self.summarize:
+            # Short enough to keep the gist of every turn without an extra LLM call
+            return _gist(turns)
+
+        # Each turn pushes one more turn out of the recent window, so start from the
+        # summary of the longest prefix we already have rather than from scratch
+        base, done = None, 0
+        for i in range(len(turns), 0, -1):
+            cached = self.cache.get(make_key("history_summary", _transcript(turns[:i])))
+            if cached:
+                base, done = cached, i
+                break
+        rest = turns[done:]
+        if not rest:
+            return base
+        if base and count_tokens(_transcript(rest)) <= self.summary_threshold_tokens:
+            # Only a few turns since the last summary; append their gist until they add up
+            return f"{base} | {_gist(rest)}"
+
+        text = f"Summary so far: {base}\n{_transcript(rest)}" if base else _transcript(rest)
+        try:
+            summary = self.summarize(text)
+        except Exception as e:
+            logger.warning("History summary failed: %s", e)
+            return f"{base} | {_gist(rest)}" if base else _gist(rest)
+        self.cache.set(make_key("history_summary", transcript), summary)
+        return summary
+
+    def build(self, system_prompt: str, history_messages: list, task: str, steps: list = None) -> list:
+        """
+        Builds the message list for one LLM call. `steps` is the transcript so far:
+        text ReAct steps are dicts with "response" and "observation" (fan-out steps also
+        keep per-action "observations" as (tool_name, output) pairs); native tool-calling
+        steps carry the assistant "message" and "results" as (tool_call_id, output) pairs.
+        """
+        steps = steps or []
+        history_messages = list(history_messages)
+
+        step_messages = []
+        # The latest step's results, each truncated on its own: (tool_name or call_id, output)
+        latest_parts = []
+        for n, step in enumerate(steps):
+            latest = n == len(steps) - 1
+            limit = self.observation_tokens if latest else self.stale_observation_tokens
+            if "message" in step:
+                step_messages.append(step["message"])
+                for call_id, output in step.get("results") or []:
+                    step_messages.append({"role": "tool", "tool_call_id": call_id, "content": truncate_tokens(output, limit)})
+                if latest:
+                    latest_parts = [(call_id, truncate_tokens(output, limit)) for call_id, output in step.get("results") or []]
+                continue
+            step_messages.append({"role": "assistant", "content": step["response"]})
+            if step.get("observations"):
+                parts = [(name, truncate_tokens(obs, limit)) for name, obs in step["observations"]]
+                step_messages.append({"role": "user", "content": f"Observation: {format_observations(parts)}"})
+                if latest:
+                    latest_parts = parts
+            elif step.get("observation") is not None:
+                parts = [(None, truncate_tokens(step["observation"], limit))]
+                step_messages.append({"role": "user", "content": f"Observation: {parts[0][1]}"})
+                if latest:
+                    latest_parts = parts
+
+        def assemble():
+            return ([{"role": "system", "content": system_prompt}] + history_messages
+                    + [{"role": "user", "content": task}] + step_messages)
+
+        messages = assemble()
+        # Over budget: shed conversation history (summary last), oldest first
+        while count_message_tokens(messages) > self.budget_tokens and history_messages:
+            drop = 1 if len(history_messages) > 1 and history_messages[0]["role"] == "system" else 0
+            history_messages.pop(drop)
+            messages = assemble()
+
+        # Still over: shrink the latest step's results to share whatever room is left
+        over = count_message_tokens(messages) - self.budget_tokens
+        if over > 0 and latest_parts:
+            # A few tokens per result go to the "...[truncated]" marker
+            room = sum(count_tokens(obs) for _, obs in latest_parts) - over - 4 * len(latest_parts)
+            parts = fit_observations(latest_parts, max(room, 50 * len(latest_parts)))
+            if "message" in steps[-1]:
+                start = len(step_messages) - len(parts)
+                for i, (call_id, output) in enumerate(parts):
+                    step_messages[start + i] = {"role": "tool", "tool_call_id": call_id, "content": output}
+            elif parts[0][0] is None:
+                step_messages[-1] = {"role": "user", "content": f"Observation: {parts[0][1]}"}
+            else:
+                step_messages[-1] = {"role": "user", "content": f"Observation: {format_observations(parts)}"}
+            messages = assemble()
+        return messages
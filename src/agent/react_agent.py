@@ -1,16 +1,67 @@
 import os
 import re
-from groq import Groq
+import json
+import time
+import asyncio
+import logging
 from src.agent.tool_registry import registry
 from src.agent.intent_router import IntentRouter
+from src.agent.prompt_builder import PromptBuilder, count_tokens, truncate_tokens, format_observations
+from src.agent.llm_gateway import LLMGateway
+from src.agent.model_scheduler import ModelScheduler, SMALL_MODEL
+from src.agent.task_budget import BudgetExceeded, TaskBudget, current_budget, set_current_budget
+from src.tools.browser import BrowserManager
+from src.utils.worker_pool import WorkerPool
+from src.utils.rate_limiter import RateLimiter
+from src.utils.tracing import span, annotate
+from src.utils import metrics
 
 # Import tools to register them
 import src.tools.web_search
 import src.tools.summarize
+import src.tools.fetch
+
+logger = logging.getLogger(__name__)
 
 # Register tools explicitly
 registry.register(src.tools.web_search.web_search)
-registry.register(src.tools.summarize.summarize_page)
+registry.register(src.tools.summarize.summarize_page, timeout=src.tools.summarize.TIMEOUT)
+registry.register(src.tools.fetch.fetch_page, timeout=45.0) # May escalate to a full browser load
+
+# Upper bound on actions the LLM may fan out in a single step
+MAX_PARALLEL_ACTIONS = 5
+
+# Filled in with the tool catalog; nothing task-specific may go in here
+REACT_PROMPT_TEMPLATE = """
+You are Tinker, an autonomous agent.
+You have access to the following tools:
+{tools_desc}
+
+Use the following format:
+Task: the input task you must solve
+Thought: you should always think about what to do
+Action: the action to take, should be one of [{tool_names}]
+Action Input: the input to the action
+Observation: the result of the action
+... (this Thought/Action/Action Input/Observation can repeat N times)
+Thought: I now know the final answer
+Final Answer: the final answer to the original input task
+
+When several actions do not depend on each other (e.g. searching three sites), you may
+run them together in one step instead of Action/Action Input, using a JSON list:
+Actions: [{{"action": "web_search", "input": "first query"}}, {{"action": "web_search", "input": "second query"}}]
+"input" may be a string, or an object of named arguments for tools that take several.
+You will then get one numbered Observation per action.
+
+Begin!
+"""
+
+# System prompt for native tool calling; the tool catalog travels as JSON schemas instead
+NATIVE_SYSTEM_PROMPT = (
+    "You are Tinker, an autonomous agent. Use the provided tools to complete the user's task. "
+    "When several tool calls don't depend on each other, make them together in one turn. "
+    "When you have everything you need, reply with the final answer only."
+)
 
 class ReactAgent:
     def __init__(self):
@@ -19,147 +70,537 @@ class ReactAgent:
              # In a real app, handled more gracefully
              print("Warning: GROQ_API_KEY missing.")
         
-        self.client = Groq(api_key=api_key)
+        # Shared, rate-limited LLM access (retries, optional fallback provider)
+        self.llm = LLMGateway.get_instance()
         self.router = IntentRouter()
         self.max_steps = 5
+        # Small model for routine steps, large one for planning, recovery and answers
+        self.scheduler = ModelScheduler()
+        # "react": text Thought/Action format parsed with regexes (works with any model)
+        # "native": provider JSON tool calling with schemas generated from the registry
+        self.tool_mode = os.getenv("TINKER_TOOL_MODE", "react").lower()
+        # Bounded pool that keeps blocking agent work off the event loop
+        self.pool = WorkerPool()
+        # Per-user quota; RATE_LIMIT_BACKEND=sqlite shares it across worker processes
+        self.rate_limiter = RateLimiter(max_requests=5, period_seconds=600)
+        # Keeps every prompt inside a token budget (history summary, trimmed observations)
+        self.prompt_builder = PromptBuilder(summarize=self._summarize_history)
+        # ReAct system prompt, rebuilt only when the tool registry changes
+        self._system_prompt = None
+        registry.on_change(self._invalidate_system_prompt)
+
+    async def process_message_async(self, message: str, history: list = None, user_id: str = "default_user") -> str:
+        """
+        Async entry point for interfaces running on an event loop.
+        Waits for a worker slot, then runs the pipeline without blocking other channels.
+        """
+        answer = ""
+        async for event in self.stream_message(message, history=history, user_id=user_id):
+            if event["type"] == "final":
+                answer = event["text"]
+        return answer
 
     def process_message(self, message: str, history: list = None, user_id: str = "default_user") -> str:
         """
-        Main entry point for processing a user message.
+        Synchronous entry point for scripts. Must not be called from a running event loop.
         """
-        # Check Rate Limit
-        from src.utils.rate_limiter import RateLimiter
-        if not hasattr(self, 'rate_limiter'):
-             self.rate_limiter = RateLimiter(max_requests=5, period_seconds=600)
+        return asyncio.run(self.process_message_async(message, history=history, user_id=user_id))
 
+    async def stream_message(self, message: str, history: list = None, user_id: str = "default_user"):
+        """
+        Processes a message as an async stream of progress events, so interfaces can
+        show something useful long before the task finishes. Events are dicts:
+        - {"type": "thought", "text": ...}               reasoning behind the next step
+        - {"type": "tool_start", "tool": ..., "input": ...}
+        - {"type": "tool_end", "tool": ..., "output": ...}
+        - {"type": "answer_delta", "text": ...}          next chunk of the answer as it streams
+        - {"type": "answer_reset"}                       the streamed text wasn't the answer after all; discard it
+        - {"type": "final", "text": ...}                 complete answer, always the last event
+        """
+        arrived = time.monotonic()
+        with span("agent.message", user_id=user_id, tool_mode=self.tool_mode) as root:
+            # The browser keeps this user's session for the whole task, not just one tool call
+            async with self.pool.slot(user_id), BrowserManager.task_scope(user_id):
+                # The deadline starts once the task runs: a message queued behind the same
+                # user's previous one mustn't spend its budget waiting
+                budget = TaskBudget()
+                root.set(queued_ms=round((budget.started - arrived) * 1000, 1))
+                async for event in self._process(message, history, user_id, budget, arrived):
+                    with root.paused():
+                        yield event
+            root.set(tokens=budget.tokens, tool_seconds=round(budget.tool_seconds, 3))
+
+    async def _process(self, message: str, history: list, user_id: str, budget: TaskBudget = None,
+                       arrived: float = None):
+        """
+        Main pipeline for processing a user message. `arrived` (time.monotonic()) is when
+        the message came in, for the end-to-end latency metric.
+        """
+        # Check Rate Limit
         if not self.rate_limiter.is_allowed(user_id):
-            return "You have reached the rate limit (5 requests per 10 minutes). Please try again later."
+            metrics.RATE_LIMITED.inc()
+            yield {"type": "final", "text": "You have reached the rate limit (5 requests per 10 minutes). Please try again later."}
+            return
 
         # Set context var for memory tools
         from src.tools.memory_tools import set_current_user
         set_current_user(user_id)
+        # Deadline/token/tool-time limits, seen by tools and LLM calls on worker threads too
+        budget = budget or TaskBudget()
+        set_current_budget(budget)
+        arrived = arrived if arrived is not None else budget.started
 
         # 1. Classify Intent
-        intent = self.router.classify(message)
-        print(f"DEBUG: Intent detected: {intent}")
+        with span("agent.intent") as intent_span:
+            intent = await self.pool.run_blocking(self.router.classify, message)
+            intent_span.set(intent=intent)
+        logger.debug("Intent detected: %s", intent)
 
         if intent == "chat":
-            return self._handle_chat(message, history)
+            events = self._handle_chat(message, history)
+        elif self.tool_mode == "native":
+            events = self._run_native_loop(message, history)
         else:
             # For 'search' or 'unknown' (treat unknown as potential complex task), enter ReAct loop
-            return self._run_react_loop(message, history)
+            events = self._run_react_loop(message, history)
+        with span("agent.loop", intent=intent) as loop_span:
+            async for event in events:
+                if event["type"] == "final":
+                    metrics.TASK_SECONDS.observe(time.monotonic() - arrived, intent=intent)
+                with loop_span.paused():
+                    yield event
 
-    def _handle_chat(self, message: str, history: list = None) -> str:
-        messages = [{"role": "system", "content": "You are Tinker, a helpful AI assistant. Be brief and friendly."}]
-        
-        # Inject short-term history if available
-        if history:
-            # Convert generic history format to Groq format if needed, 
-            # but assuming history passed in is list of {"role": "user"/"assistant", "content": "..."}
-            # We filter for only user/assistant messages
-            clean_history = [
-                {"role": msg["role"], "content": msg["content"]} 
-                for msg in history 
-                if msg["role"] in ["user", "assistant"]
-            ]
-            messages.extend(clean_history[-10:]) # Keep last 10 messages
+    async def _stream_completion(self, tool_calls: list = None, **kwargs):
+        """
+        Streams a Groq chat completion, yielding text deltas as they arrive.
+        The blocking SDK iterator runs on the worker pool and hands chunks to the loop.
+        If `tool_calls` is given, streamed tool call fragments are assembled into it
+        as {"id", "name", "arguments"} dicts.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        done = object()
+        calls = {}
 
-        # Add current message
-        messages.append({"role": "user", "content": message})
+        def produce():
+            produced = 0
+            try:
+                for chunk in self.llm.chat(stream=True, **kwargs):
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta
+                    for fragment in getattr(delta, "tool_calls", None) or []:
+                        call = calls.setdefault(fragment.index, {"id": "", "name": "", "arguments": ""})
+                        call["id"] = fragment.id or call["id"]
+                        if fragment.function:
+                            call["name"] += fragment.function.name or ""
+                            call["arguments"] += fragment.function.arguments or ""
+                    if delta.content:
+                        produced += count_tokens(delta.content)
+                        loop.call_soon_threadsafe(queue.put_nowait, delta.content)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                budget = current_budget.get()
+                if budget is not None:
+                    budget.charge_tokens(produced)
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+
+        with span("llm.stream", model=kwargs.get("model")) as stream_span:
+            producer = asyncio.ensure_future(self.pool.run_blocking(produce))
+            start = time.perf_counter()
+            try:
+                while True:
+                    item = await queue.get()
+                    if item is done:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    if start is not None:
+                        stream_span.set(first_token_ms=round((time.perf_counter() - start) * 1000, 1))
+                        start = None
+                    with stream_span.paused():
+                        yield item
+            finally:
+                await producer
+        if tool_calls is not None:
+            tool_calls.extend(calls[i] for i in sorted(calls))
+
+    def _react_system_prompt(self) -> str:
+        if self._system_prompt is None:
+            self._system_prompt = REACT_PROMPT_TEMPLATE.format(
+                tools_desc=registry.get_tools_description(),
+                tool_names=", ".join(registry.list_tools()),
+            )
+        return self._system_prompt
 
-        completion = self.client.chat.completions.create(
-            model="llama3-8b-8192",
-            messages=messages
+    def _invalidate_system_prompt(self, _registry):
+        self._system_prompt = None
+
+    def _summarize_history(self, transcript: str) -> str:
+        """Condenses older conversation turns for PromptBuilder (blocking)."""
+        completion = self.llm.chat(
+            model=SMALL_MODEL,
+            messages=[
+                {"role": "system", "content": "Summarize this chat in at most 3 sentences. Keep names, facts, preferences and open requests."},
+                {"role": "user", "content": transcript},
+            ],
+            temperature=0.0,
+            max_tokens=150,
         )
-        return completion.choices[0].message.content
+        return completion.choices[0].message.content.strip()
 
-    def _run_react_loop(self, task: str, history: list = None) -> str:
-        """
-        Executes the ReAct (Reasoning + Acting) loop.
-        """
-        tools_desc = registry.get_tools_description()
-        
-        system_prompt = f"""
-You are Tinker, an autonomous agent.
-You have access to the following tools:
-{tools_desc}
+    async def _handle_chat(self, message: str, history: list = None):
+        # Last 10 turns verbatim, anything older rolled into a summary
+        history_messages = await self.pool.run_blocking(self.prompt_builder.compact_history, history, 10)
+        messages = self.prompt_builder.build(
+            "You are Tinker, a helpful AI assistant. Be brief and friendly.", history_messages, message
+        )
 
-Use the following format:
-Task: the input task you must solve
-Thought: you should always think about what to do
-Action: the action to take, should be one of [{", ".join(registry.list_tools())}]
-Action Input: the input to the action
-Observation: the result of the action
-... (this Thought/Action/Action Input/Observation can repeat N times)
-Thought: I now know the final answer
-Final Answer: the final answer to the original input task
+        answer = ""
+        try:
+            async for delta in self._stream_completion(model=SMALL_MODEL, messages=messages):
+                answer += delta
+                yield {"type": "answer_delta", "text": delta}
+        except Exception as e:
+            # Out of time (or a rate-limit wait past the deadline): reply with what we have
+            budget = current_budget.get()
+            if not (isinstance(e, BudgetExceeded) or (budget is not None and budget.exhausted())):
+                raise
+            if not answer.strip():
+                async for event in self._best_effort_answer(message, [], budget or TaskBudget()):
+                    yield event
+                return
+        yield {"type": "final", "text": answer}
 
-Begin!
+    async def _run_react_loop(self, task: str, history: list = None):
         """
-        
-        agent_messages = [{"role": "system", "content": system_prompt}]
-        
-        # Inject short-term history for context (simplified)
-        # For ReAct, we primarily want the *Task* context. 
-        # If the user says "do it again", we need the previous messages.
-        if history:
-             # Add recent history as a context block or individual messages
-             # For simplicity, let's just add them as previous user/assistant turns *before* the current task prompt
-            clean_history = [
-                {"role": msg["role"], "content": msg["content"]} 
-                for msg in history 
-                if msg["role"] in ["user", "assistant"]
-            ]
-            agent_messages.extend(clean_history[-5:])
+        Executes the ReAct (Reasoning + Acting) loop, yielding progress events.
+        """
+        # Identical bytes on every call, so provider-side prompt caching can reuse the prefix
+        system_prompt = self._react_system_prompt()
 
-        agent_messages.append({"role": "user", "content": f"Task: {task}"})
+        # Short-term history gives context for follow-ups like "do it again".
+        # Recent turns stay verbatim; older ones are summarized to save tokens on every step.
+        history_messages = await self.pool.run_blocking(self.prompt_builder.compact_history, history, 5)
+        # Transcript of this task: each step's LLM response and the observation it produced
+        steps = []
+        escalate = False
+        budget = current_budget.get() or TaskBudget()
 
         for i in range(self.max_steps):
-            print(f"DEBUG: Step {i+1}")
+            if budget.exhausted():
+                async for event in self._best_effort_answer(task, steps, budget):
+                    yield event
+                return
+            logger.debug("Step %d", i + 1)
+            annotate(steps=i + 1)
             
-            # 1. LLM Generation
-            completion = self.client.chat.completions.create(
-                model="llama3-70b-8192", # Stronger model for reasoning
-                messages=agent_messages,
-                stop=["Observation:"] # Stop before generating observation
-            )
-            response = completion.choices[0].message.content
-            print(f"DEBUG: LLM Response:\n{response}")
+            # 1. LLM Generation, streamed so a final answer reaches the user as it's written
+            agent_messages = self.prompt_builder.build(system_prompt, history_messages, f"Task: {task}", steps)
+            model = self.scheduler.pick(i, escalate)
+            try:
+                while True:
+                    response = ""
+                    answer_sent = 0
+                    async for delta in self._stream_completion(
+                        model=model,
+                        messages=agent_messages,
+                        stop=["Observation:"] # Stop before generating observation
+                    ):
+                        response += delta
+                        if "Final Answer:" in response:
+                            answer = response.split("Final Answer:")[-1].lstrip()
+                            # Small-model answers may still be re-run on the large model, so they're held back
+                            if len(answer) > answer_sent and (answer_sent or self.scheduler.can_stream(model, answer)):
+                                yield {"type": "answer_delta", "text": answer[answer_sent:]}
+                                answer_sent = len(answer)
+                    answer = response.split("Final Answer:")[-1].strip() if "Final Answer:" in response else None
+                    # Once part of an answer was streamed it stands
+                    if (answer_sent or not self.scheduler.is_small(model)
+                            or not self.scheduler.needs_large(answer, self._parse_actions(response))):
+                        break
+                    logger.debug("Escalating step %d from %s to %s", i + 1, model, self.scheduler.large)
+                    model = self.scheduler.large
+            except Exception as e:
+                # A call cut short by the task deadline (or a rate-limit wait past it) still gets an answer out
+                if not (budget.exhausted() or isinstance(e, BudgetExceeded)):
+                    raise
+                async for event in self._best_effort_answer(task, steps, budget):
+                    yield event
+                return
+            logger.debug("LLM response (%s):\n%s", model, response)
             
-            # Append agent response to history
-            agent_messages.append({"role": "assistant", "content": response})
+            # Append agent response to the transcript
+            steps.append({"response": response, "observation": None})
 
             # 2. Check for Final Answer
-            if "Final Answer:" in response:
-                return response.split("Final Answer:")[-1].strip()
+            if answer is not None:
+                if len(answer) > answer_sent:
+                    yield {"type": "answer_delta", "text": answer[answer_sent:]}
+                yield {"type": "final", "text": answer}
+                return
 
-            # 3. Parse Action
-            match = re.search(r"Action: (\w+)\nAction Input: (.+)", response, re.DOTALL)
-            if not match:
+            # 3. Parse Action(s)
+            actions = self._parse_actions(response)
+            if not actions:
                 # If no strict action/input format, user might have just chatted or LLM hallucinated format
-                return response
+                yield {"type": "final", "text": response}
+                return
 
-            tool_name = match.group(1).strip()
-            tool_input = match.group(2).strip()
+            thought = re.search(r"Thought:(.*?)(?:\nActions?:|$)", response, re.DOTALL)
+            if thought and thought.group(1).strip():
+                yield {"type": "thought", "text": thought.group(1).strip()}
 
-            # 4. Execute Tool
-            tool_func = registry.get_tool(tool_name)
-            observation = ""
-            if tool_func:
-                try:
-                    # Simple arg parsing (assumes single string input mostly)
-                    # For web_search(query, max_results), we might need smarter parsing if passing JSON
-                    # But for now, let's treat input as the first arg string
-                    observation = tool_func(tool_input)
-                except Exception as e:
-                    observation = f"Error executing {tool_name}: {e}"
+            # 4. Execute Tool(s) concurrently, reporting each as it finishes
+            observations = [None] * len(actions)
+            async for event in self._execute_actions(actions, observations):
+                yield event
+
+            if len(actions) == 1:
+                observation = observations[0]
             else:
-                observation = f"Tool '{tool_name}' not found."
+                # Kept per action too, so PromptBuilder can trim each result on its own
+                steps[-1]["observations"] = [(tool_name, obs) for (tool_name, _), obs in zip(actions, observations)]
+                observation = format_observations(steps[-1]["observations"])
+
+            logger.debug("Observation: %s...", observation[:100]) # Log beginning
+
+            # 5. Append Observation (PromptBuilder trims it once it's stale)
+            steps[-1]["observation"] = observation
+            # A failed tool call means the plan needs rethinking: next step goes to the large model
+            escalate = self.scheduler.failed(observations)
+
+        yield {"type": "final", "text": "I processed the task but reached the maximum number of steps without a final answer."}
+
+    async def _run_native_loop(self, task: str, history: list = None):
+        """
+        Agent loop using the provider's native tool calling: the model returns structured
+        calls (with typed, multi-argument inputs) instead of text we have to regex-parse.
+        """
+        history_messages = await self.pool.run_blocking(self.prompt_builder.compact_history, history, 5)
+        steps = []
+        escalate = False
+        budget = current_budget.get() or TaskBudget()
+
+        for i in range(self.max_steps):
+            if budget.exhausted():
+                async for event in self._best_effort_answer(task, steps, budget):
+                    yield event
+                return
+            logger.debug("Step %d (native tools)", i + 1)
+            annotate(steps=i + 1)
+            messages = self.prompt_builder.build(NATIVE_SYSTEM_PROMPT, history_messages, task, steps)
+            model = self.scheduler.pick(i, escalate)
+            try:
+                while True:
+                    calls = []
+                    text = ""
+                    answer_sent = 0
+                    async for delta in self._stream_completion(
+                        tool_calls=calls,
+                        model=model,
+                        messages=messages,
+                        tools=registry.get_tool_schemas(),
+                        tool_choice="auto",
+                    ):
+                        text += delta
+                        answer = text.lstrip()
+                        if not calls and len(answer) > answer_sent and (answer_sent or self.scheduler.can_stream(model, answer)):
+                            yield {"type": "answer_delta", "text": answer[answer_sent:]}
+                            answer_sent = len(answer)
+                    if calls and answer_sent:
+                        # Tool calls only arrive at the end of the stream: the text streamed so far
+                        # was a preamble to them, not the answer
+                        yield {"type": "answer_reset"}
+                        answer_sent = 0
+                    answer = None if calls else text.strip()
+                    if (answer_sent or not self.scheduler.is_small(model)
+                            or not self.scheduler.needs_large(answer, [(c["name"], None) for c in calls])):
+                        break
+                    logger.debug("Escalating step %d from %s to %s", i + 1, model, self.scheduler.large)
+                    model = self.scheduler.large
+            except Exception as e:
+                if not (budget.exhausted() or isinstance(e, BudgetExceeded)):
+                    raise
+                async for event in self._best_effort_answer(task, steps, budget):
+                    yield event
+                return
+
+            if not calls:
+                if len(answer) > answer_sent:
+                    yield {"type": "answer_delta", "text": answer[answer_sent:]}
+                yield {"type": "final", "text": answer}
+                return
+            if text.strip():
+                yield {"type": "thought", "text": text.strip()}
+
+            actions = []
+            observations = [None] * len(calls)
+            for n, call in enumerate(calls):
+                try:
+                    arguments = json.loads(call["arguments"] or "{}")
+                except ValueError as e:
+                    # Report the bad call back to the model instead of wasting the step
+                    arguments = None
+                    observations[n] = f"Error: invalid JSON arguments for {call['name']}: {e}"
+                actions.append((call["name"], arguments))
+            runnable = [(n, a) for n, a in enumerate(actions) if a[1] is not None]
+            results = [None] * len(runnable)
+            async for event in self._execute_actions([a for _, a in runnable], results):
+                yield event
+            for (n, _), obs in zip(runnable, results):
+                observations[n] = obs
+
+            steps.append({
+                "message": {
+                    "role": "assistant",
+                    "content": text,
+                    "tool_calls": [
+                        {"id": c["id"], "type": "function", "function": {"name": c["name"], "arguments": c["arguments"] or "{}"}}
+                        for c in calls
+                    ],
+                },
+                "results": [(c["id"], obs) for c, obs in zip(calls, observations)],
+            })
+            escalate = self.scheduler.failed(observations)
+
+        yield {"type": "final", "text": "I processed the task but reached the maximum number of steps without a final answer."}
+
+    async def _best_effort_answer(self, task: str, steps: list, budget: TaskBudget):
+        """
+        Ends a task that ran out of budget: a short answer from what the steps found so
+        far, written by the small model in the reserved time, or the raw findings.
+        """
+        reason = budget.exhausted() or "time"
+        logger.info("Task budget exhausted (%s) after %.1fs; answering with what we have", reason, budget.elapsed())
+        notes = []
+        for step in steps:
+            if step.get("observation"):
+                notes.append(step["observation"])
+            notes.extend(output for _, output in step.get("results") or [])
+        findings = truncate_tokens("\n\n".join(notes), 1500)
 
-            print(f"DEBUG: Observation: {observation[:100]}...") # Log beginning
+        if findings and budget.remaining() > 1:
+            messages = [
+                {"role": "system", "content": "You ran out of time on this task. Answer it as well as you can from the notes, and say briefly what is incomplete."},
+                {"role": "user", "content": f"Task: {task}\n\nNotes:\n{findings}"},
+            ]
+            answer = ""
+            try:
+                async for delta in self._stream_completion(model=SMALL_MODEL, messages=messages, max_tokens=300):
+                    answer += delta
+                    yield {"type": "answer_delta", "text": delta}
+            except Exception as e:
+                logger.warning("Best-effort answer failed: %s", e)
+            if answer.strip():
+                yield {"type": "final", "text": answer.strip()}
+                return
+
+        if findings:
+            text = f"I ran out of time before finishing. Here's what I found so far:\n\n{truncate_tokens(findings, 400)}"
+        else:
+            text = "I ran out of time before finishing. Please try a simpler or more specific request."
+        yield {"type": "final", "text": text}
+
+    async def _execute_actions(self, actions: list, observations: list):
+        """
+        Runs (tool_name, tool_input) actions concurrently, yielding tool_start/tool_end
+        events and storing each result at its index in `observations`.
+        """
+        async def indexed(n, tool_name, tool_input):
+            return n, await self._run_action(tool_name, tool_input)
 
-            # 5. Append Observation
-            obs_message = f"Observation: {observation}"
-            agent_messages.append({"role": "user", "content": obs_message})
+        for tool_name, tool_input in actions:
+            yield {"type": "tool_start", "tool": tool_name, "input": tool_input}
+        for next_done in asyncio.as_completed(
+            [indexed(n, tool_name, tool_input) for n, (tool_name, tool_input) in enumerate(actions)]
+        ):
+            n, obs = await next_done
+            observations[n] = obs
+            yield {"type": "tool_end", "tool": actions[n][0], "output": obs}
 
-        return "I processed the task but reached the maximum number of steps without a final answer."
+    def _parse_actions(self, response: str) -> list:
+        """
+        Extracts the (tool_name, tool_input) pairs requested in an LLM turn.
+        Accepts either a JSON `Actions:` list or a single Action/Action Input pair.
+        """
+        multi = re.search(r"Actions:\s*(\[.*\])", response, re.DOTALL)
+        if multi:
+            try:
+                items = json.loads(multi.group(1))
+                actions = [
+                    (str(item["action"]).strip(), item.get("input", ""))
+                    for item in items
+                    if isinstance(item, dict) and "action" in item
+                ]
+                if actions:
+                    return actions[:MAX_PARALLEL_ACTIONS]
+            except (ValueError, TypeError):
+                pass # Fall back to the single-action format below
+
+        match = re.search(r"Action: (\w+)\nAction Input: (.+)", response, re.DOTALL)
+        if not match:
+            return []
+        return [(match.group(1).strip(), match.group(2).strip())]
+
+    async def _run_action(self, tool_name: str, tool_input) -> str:
+        """Executes one action under its tool's timeout, capped by the task's remaining budget."""
+        timeout = registry.get_timeout(tool_name)
+        budget = current_budget.get()
+        if budget is not None:
+            timeout = budget.tool_timeout(timeout)
+            if timeout <= 0:
+                return f"Error executing {tool_name}: skipped, the task is out of time"
+        start = time.monotonic()
+        ok = False
+        with span(f"tool.{tool_name}", tool=tool_name, timeout_s=round(timeout, 1)) as tool_span:
+            try:
+                observation = await asyncio.wait_for(self._execute_tool(tool_name, tool_input), timeout=timeout)
+                ok = not observation.startswith(("Error", "Tool '"))
+                tool_span.set(ok=ok, output_chars=len(observation))
+                return observation
+            except asyncio.TimeoutError:
+                # Sync tools keep running in their worker thread; we just stop waiting.
+                ok = False
+                tool_span.set(ok=False, timed_out=True)
+                return f"Error executing {tool_name}: timed out after {timeout:.3g}s"
+            finally:
+                elapsed = time.monotonic() - start
+                metrics.TOOL_SECONDS.observe(elapsed, tool=tool_name)
+                if not ok:
+                    metrics.TOOL_ERRORS.inc(tool=tool_name)
+                if budget is not None:
+                    budget.charge_tool(elapsed)
+
+    async def _execute_tool(self, tool_name: str, tool_input) -> str:
+        """
+        Runs a registered tool. Async tools are awaited on the running loop;
+        sync tools (web_search, summarize_page, ...) run on the worker pool.
+        """
+        tool_func = registry.get_tool(tool_name)
+        if not tool_func:
+            return f"Tool '{tool_name}' not found."
+        try:
+            args, kwargs = self._call_args(tool_func, tool_input)
+            if registry.is_async(tool_name):
+                observation = await tool_func(*args, **kwargs)
+            else:
+                observation = await self.pool.run_blocking(tool_func, *args, **kwargs)
+        except Exception as e:
+            observation = f"Error executing {tool_name}: {e}"
+        return str(observation)
+
+    def _call_args(self, tool_func, tool_input):
+        """
+        Maps an action input onto the tool's parameters:
+        an object becomes keyword arguments, a list positional arguments,
+        and a plain string the first argument (or nothing for tools without parameters).
+        """
+        if isinstance(tool_input, dict):
+            return [], tool_input
+        if isinstance(tool_input, list):
+            return tool_input, {}
+        if not registry.get_signature(tool_func.__name__).parameters:
+            return [], {}
+        return [tool_input], {}
@@ -0,0 +1,74 @@
+import os
+import time
+import threading
+import contextvars
+
+
+class BudgetExceeded(Exception):
+    """Raised when work is started after the task's deadline has passed."""
+
+
+class TaskBudget:
+    """
+    Wall-clock, token and tool-time limits for one task.
+
+    - `seconds`: the whole task must finish within this (TINKER_TASK_SECONDS, default 40,
+      under the PRD's 45s target). The last `reserve_seconds` are kept for writing a
+      best-effort answer, so the loop stops planning new steps once they're reached.
+    - `max_tokens`: LLM tokens (prompt + completion) the task may spend (TINKER_TASK_MAX_TOKENS).
+    - `max_tool_seconds`: total time spent in tools (TINKER_TASK_MAX_TOOL_SECONDS).
+
+    The active budget travels in the `current_budget` context variable, so tools
+    and LLM calls on worker threads (started with `run_blocking`) see it too.
+    """
+
+    def __init__(self, seconds: float = None, max_tokens: int = None,
+                 max_tool_seconds: float = None, reserve_seconds: float = None):
+        self.seconds = seconds or float(os.getenv("TINKER_TASK_SECONDS", "40"))
+        self.max_tokens = max_tokens or int(os.getenv("TINKER_TASK_MAX_TOKENS", "40000"))
+        self.max_tool_seconds = max_tool_seconds or float(os.getenv("TINKER_TASK_MAX_TOOL_SECONDS", "30"))
+        self.reserve_seconds = reserve_seconds if reserve_seconds is not None else float(os.getenv("TINKER_TASK_RESERVE_SECONDS", "6"))
+        self.started = time.monotonic()
+        self.deadline = self.started + self.seconds
+        self.tokens = 0
+        self.tool_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float:
+        """Seconds until the hard deadline."""
+        return self.deadline - time.monotonic()
+
+    def exhausted(self) -> str:
+        """Why no further steps should be started ("time", "tokens" or "tool time"), or None."""
+        if self.remaining() <= self.reserve_seconds:
+            return "time"
+        if self.tokens >= self.max_tokens:
+            return "tokens"
+        if self.tool_seconds >= self.max_tool_seconds:
+            return "tool time"
+        return None
+
+    def check(self):
+        if self.remaining() <= 0:
+            raise BudgetExceeded(f"task deadline of {self.seconds:g}s passed")
+
+    def charge_tokens(self, tokens: int):
+        with self._lock:
+            self.tokens += tokens
+
+    def charge_tool(self, seconds: float):
+        with self._lock:
+            self.tool_seconds += seconds
+
+    def tool_timeout(self, timeout: float) -> float:
+        """A tool's own timeout, cut down to what the task has left (may be <= 0)."""
+        return min(timeout, self.remaining() - self.reserve_seconds, self.max_tool_seconds - self.tool_seconds)
+
+
+current_budget = contextvars.ContextVar("current_budget", default=None)
+
+def set_current_budget(budget: TaskBudget):
+    current_budget.set(budget)
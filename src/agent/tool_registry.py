@@ -1,12 +1,52 @@
+import inspect
 from typing import Callable, Dict, Any, List
 from src.tools.browser import navigate, click, fill_form, extract_text, screenshot
-from src.tools.memory_tools import remember, recall
+from src.tools.memory_tools import remember, recall, search_memory
+
+# Seconds a single tool call may take before the agent gives up on it
+DEFAULT_TOOL_TIMEOUT = 30.0
+
+# Python annotation -> JSON schema type, for native tool calling
+JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean", list: "array", dict: "object"}
+
+def _json_schema(name: str, sig: inspect.Signature, doc: str) -> Dict[str, Any]:
+    properties = {}
+    required = []
+    for param in sig.parameters.values():
+        prop = {"type": JSON_TYPES.get(param.annotation, "string")}
+        if param.default is inspect.Parameter.empty:
+            required.append(param.name)
+        else:
+            prop["default"] = param.default
+        properties[param.name] = prop
+    return {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": doc,
+            "parameters": {"type": "object", "properties": properties, "required": required},
+        },
+    }
 
 class ToolRegistry:
+    """
+    Registered tools plus metadata computed once at registration (signature, async-ness,
+    description line). `version` increases on every change and `on_change` callbacks fire,
+    so callers can cache anything derived from the catalog (e.g. the system prompt).
+    """
     def __init__(self):
         self._tools: Dict[str, Callable] = {}
+        # name -> True for `async def` tools, which must be awaited rather than called
+        self._is_async: Dict[str, bool] = {}
+        self._timeouts: Dict[str, float] = {}
+        self._signatures: Dict[str, inspect.Signature] = {}
+        self._descriptions: Dict[str, str] = {}
+        self._schemas: Dict[str, Dict[str, Any]] = {}
+        self._catalog: str = None
+        self._listeners: List[Callable] = []
+        self.version = 0
         # Auto-register browser tools
-        self.register(navigate)
+        self.register(navigate, timeout=40.0) # page.goto itself may take 30s
         self.register(click)
         self.register(fill_form)
         self.register(extract_text)
@@ -14,24 +54,61 @@ class ToolRegistry:
         # Register memory tools
         self.register(remember)
         self.register(recall)
+        self.register(search_memory)
 
-    def register(self, func: Callable):
-        """Decorator to register a tool."""
-        self._tools[func.__name__] = func
+    def register(self, func: Callable, timeout: float = None):
+        """Decorator to register a tool. Optionally override its per-call timeout (seconds)."""
+        name = func.__name__
+        sig = inspect.signature(func)
+        doc = inspect.getdoc(func) or "No description provided."
+        self._tools[name] = func
+        self._is_async[name] = inspect.iscoroutinefunction(func)
+        self._timeouts[name] = timeout or DEFAULT_TOOL_TIMEOUT
+        self._signatures[name] = sig
+        self._descriptions[name] = f"- **{name}**{sig}: {doc}"
+        self._schemas[name] = _json_schema(name, sig, doc)
+        self._changed()
         return func
 
+    def unregister(self, name: str):
+        if self._tools.pop(name, None) is None:
+            return
+        for table in (self._is_async, self._timeouts, self._signatures, self._descriptions, self._schemas):
+            table.pop(name, None)
+        self._changed()
+
+    def on_change(self, callback: Callable):
+        """Calls `callback(registry)` whenever a tool is registered or removed."""
+        self._listeners.append(callback)
+
+    def _changed(self):
+        self.version += 1
+        self._catalog = None
+        for callback in self._listeners:
+            callback(self)
+
     def get_tool(self, name: str) -> Callable:
         return self._tools.get(name)
 
+    def is_async(self, name: str) -> bool:
+        """Whether the named tool is a coroutine function."""
+        return self._is_async.get(name, False)
+
+    def get_timeout(self, name: str) -> float:
+        return self._timeouts.get(name, DEFAULT_TOOL_TIMEOUT)
+
+    def get_signature(self, name: str) -> inspect.Signature:
+        return self._signatures.get(name)
+
     def get_tools_description(self) -> str:
-        """Returns a formatted string describing all registered tools."""
-        descriptions = []
-        for name, func in self._tools.items():
-            doc = inspect.getdoc(func) or "No description provided."
-            # Get signature (args)
-            sig = inspect.signature(func)
-            descriptions.append(f"- **{name}**{sig}: {doc}")
-        return "\n".join(descriptions)
+        """Returns a formatted string describing all registered tools (cached until tools change)."""
+        if self._catalog is None:
+            self._catalog = "\n".join(self._descriptions.values())
+        return self._catalog
+
+    def get_tool_schemas(self) -> List[Dict[str, Any]]:
+        """JSON schemas for every tool, in the provider's function-calling format."""
+        return list(self._schemas.values())
 
     def list_tools(self) -> List[str]:
         return list(self._tools.keys())
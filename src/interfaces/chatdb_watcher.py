@@ -0,0 +1,232 @@
+import os
+import sys
+import errno
+import struct
+import sqlite3
+import asyncio
+import ctypes
+import ctypes.util
+from urllib.parse import quote
+
+# inotify(7) event masks
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class ChatDB:
+    """
+    One long-lived read-only connection to a SQLite database owned by another
+    process (Messages' chat.db). Statements are cached by SQL text, so running
+    the same query repeatedly reuses its prepared statement.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            uri = f"file:{quote(self.db_path)}?mode=ro"
+            self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=32)
+        return self._conn
+
+    def query(self, sql: str, params: tuple = ()) -> list:
+        try:
+            return self._connect().execute(sql, params).fetchall()
+        except sqlite3.DatabaseError:
+            # The file may have been replaced (restore, migration); reconnect on the next call
+            self.close()
+            raise
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class _InotifyBackend:
+    """Linux: one inotify watch on the database's directory, filtered to its files."""
+    name = "inotify"
+
+    def __init__(self, db_path: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        directory = os.path.dirname(os.path.abspath(db_path))
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(self.fd, directory.encode(), mask) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, f"inotify_add_watch failed for {directory}")
+        base = os.path.basename(db_path)
+        # Committed writes land in one of these; -shm is left out since readers touch it too
+        self.names = {base, f"{base}-wal", f"{base}-journal"}
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def drain(self) -> bool:
+        """Reads all queued events; True if any touched the database files."""
+        changed = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                _wd, _mask, _cookie, length = _INOTIFY_EVENT.unpack_from(data, offset)
+                offset += _INOTIFY_EVENT.size
+                name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+                offset += length
+                changed = changed or name in self.names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _KqueueBackend:
+    """macOS/BSD: kqueue vnode filters on the database and its WAL."""
+    name = "kqueue"
+
+    def __init__(self, db_path: str):
+        import select
+        self.select = select
+        self.kq = select.kqueue()
+        self.paths = [db_path, f"{db_path}-wal"]
+        self.fds = {}
+        self._register()
+
+    def _register(self):
+        select = self.select
+        flags = (select.KQ_NOTE_WRITE | select.KQ_NOTE_EXTEND | select.KQ_NOTE_DELETE
+                 | select.KQ_NOTE_RENAME | select.KQ_NOTE_ATTRIB)
+        for path in self.paths:
+            if path in self.fds:
+                continue
+            try:
+                # O_EVTONLY: watch without keeping the volume busy
+                fd = os.open(path, getattr(os, "O_EVTONLY", os.O_RDONLY))
+            except FileNotFoundError:
+                continue # The WAL comes and goes; picked up again after the next change
+            self.fds[path] = fd
+            event = select.kevent(fd, filter=select.KQ_FILTER_VNODE,
+                                  flags=select.KQ_EV_ADD | select.KQ_EV_CLEAR, fflags=flags)
+            self.kq.control([event], 0, 0)
+
+    def fileno(self) -> int:
+        return self.kq.fileno()
+
+    def drain(self) -> bool:
+        events = self.kq.control(None, 32, 0)
+        gone = self.select.KQ_NOTE_DELETE | self.select.KQ_NOTE_RENAME
+        for event in events:
+            if event.fflags & gone:
+                path = next((p for p, fd in self.fds.items() if fd == event.ident), None)
+                if path:
+                    os.close(self.fds.pop(path))
+        self._register()
+        return bool(events)
+
+    def close(self):
+        for fd in self.fds.values():
+            os.close(fd)
+        self.fds.clear()
+        self.kq.close()
+
+
+class ChatDBWatcher:
+    """
+    Wakes the caller when a SQLite database (or its WAL) changes.
+
+    - Linux uses inotify and macOS kqueue. Both are registered with the event loop, so
+      waiting costs nothing until a write happens. A slow `safety_interval` re-check
+      covers anything a watch could miss.
+    - Otherwise (mode="poll", or no watcher available) it stats the files with
+      adaptive backoff. After a change it checks every `min_interval`, and each quiet
+      check doubles the wait, up to `max_interval`.
+    Bursts of writes (one message touches several pages) are coalesced by waiting
+    `debounce` seconds after a wake-up.
+    """
+
+    def __init__(self, db_path: str, mode: str = "auto", min_interval: float = 0.1,
+                 max_interval: float = 5.0, safety_interval: float = 30.0, debounce: float = 0.02):
+        self.db_path = db_path
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.safety_interval = safety_interval
+        self.debounce = debounce
+        self._interval = min_interval
+        self._signature = self._stat()
+        self._changed = None
+        self._backend = None
+        if mode != "poll":
+            self._backend = self._open_backend()
+        self.mode = self._backend.name if self._backend else "poll"
+
+    def _open_backend(self):
+        try:
+            if sys.platform.startswith("linux"):
+                return _InotifyBackend(self.db_path)
+            if sys.platform == "darwin" or "bsd" in sys.platform:
+                return _KqueueBackend(self.db_path)
+        except (OSError, AttributeError) as e:
+            print(f"[iMessage] File watching unavailable ({e}); falling back to polling.")
+        return None
+
+    def _stat(self) -> tuple:
+        signature = []
+        for path in (self.db_path, f"{self.db_path}-wal"):
+            try:
+                st = os.stat(path)
+                signature.append((st.st_mtime_ns, st.st_size))
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    raise
+                signature.append(None)
+        return tuple(signature)
+
+    def _on_readable(self):
+        if self._backend.drain():
+            self._changed.set()
+
+    async def wait(self) -> bool:
+        """Returns True after a change, False when a safety/poll interval passed without one."""
+        if self._backend is None:
+            return await self._poll()
+
+        if self._changed is None:
+            self._changed = asyncio.Event()
+            asyncio.get_running_loop().add_reader(self._backend.fileno(), self._on_readable)
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout=self.safety_interval)
+        except asyncio.TimeoutError:
+            return False
+        await asyncio.sleep(self.debounce)
+        self._changed.clear()
+        return True
+
+    async def _poll(self) -> bool:
+        await asyncio.sleep(self._interval)
+        signature = self._stat()
+        if signature != self._signature:
+            self._signature = signature
+            self._interval = self.min_interval
+            return True
+        # Idle: back off, capped
+        self._interval = min(self.max_interval, self._interval * 2)
+        return False
+
+    def close(self):
+        if self._backend is not None:
+            if self._changed is not None:
+                try:
+                    asyncio.get_running_loop().remove_reader(self._backend.fileno())
+                except RuntimeError:
+                    pass # No running loop anymore; the fd is closed below regardless
+            self._backend.close()
+            self._backend = None
@@ -1,5 +1,12 @@
+import io
+import time
 import discord
 from src.interfaces.base import BotInterface
+from src.utils.tracing import span
+from src.utils import metrics
+
+# Minimum seconds between edits of the progress message (Discord rate-limits edits)
+EDIT_INTERVAL = 1.0
 
 class DiscordInterface(BotInterface):
     def __init__(self, agent, token: str):
@@ -39,35 +46,80 @@ class DiscordInterface(BotInterface):
                     await message.channel.send("I'm having trouble initializing my brain. Please check the logs.")
                     return
 
-                try:
-                    await message.channel.send("Thinking... 🧠")
-                    
-                    # Fetch fetch history
-                    history = []
-                    async for msg in message.channel.history(limit=10):
-                        if msg.id == message.id: continue # Skip current command
-                        role = "assistant" if msg.author == client.user else "user"
-                        history.append({"role": role, "content": msg.content})
-                    
-                    # History is usually newest first from Discord, dependent on API but usually iterator is newest -> oldest
-                    # We want oldest -> newest for context
-                    history.reverse()
-
-                    # Offload to agent
-                    response = self.agent.process_message(content, history=history, user_id=str(message.author.id))
-                    
-                    if len(response) > 2000:
-                        # Create a temporary file
-                        import io
-                        file = discord.File(io.StringIO(response), filename="response.txt")
-                        await message.channel.send("Response is too long, attaching as file:", file=file)
-                    else:
-                        await message.channel.send(response)
-                except Exception as e:
-                    await message.channel.send(f"Oops! I encountered an error: {e}")
+                metrics.MESSAGES.inc(interface="discord")
+                with span("discord.message", channel=str(message.channel.id)):
+                    await self._handle_mention(client, message, content)
 
         return client
 
+    async def _handle_mention(self, client, message, content: str):
+        """Answers one mention: placeholder, channel history, streamed agent run, final reply."""
+        try:
+            with span("discord.send"):
+                placeholder = await message.channel.send("Thinking... 🧠")
+            
+            # Fetch fetch history
+            history = []
+            with span("discord.history"):
+                async for msg in message.channel.history(limit=10):
+                    if msg.id in (message.id, placeholder.id): continue # Skip current command and our placeholder
+                    role = "assistant" if msg.author == client.user else "user"
+                    history.append({"role": role, "content": msg.content})
+            
+            # History is usually newest first from Discord, dependent on API but usually iterator is newest -> oldest
+            # We want oldest -> newest for context
+            history.reverse()
+
+            # Offload to agent, editing the placeholder as progress comes in
+            response = await self._stream_to_message(
+                placeholder, content, history=history, user_id=str(message.author.id)
+            )
+
+            with span("discord.send", chars=len(response)):
+                if len(response) > 2000:
+                    # Create a temporary file
+                    file = discord.File(io.StringIO(response), filename="response.txt")
+                    await placeholder.edit(content="Response is too long, attaching as file:")
+                    await message.channel.send(file=file)
+                else:
+                    await placeholder.edit(content=response or "I couldn't come up with an answer.")
+        except Exception as e:
+            await message.channel.send(f"Oops! I encountered an error: {e}")
+
+    async def _stream_to_message(self, placeholder, content: str, history: list, user_id: str) -> str:
+        """
+        Consumes the agent's progress events, editing `placeholder` at most once per
+        EDIT_INTERVAL. Returns the final answer.
+        """
+        status = "Thinking... 🧠"
+        answer = ""
+        last_edit = time.monotonic()
+        async for event in self.agent.stream_message(content, history=history, user_id=user_id):
+            kind = event["type"]
+            if kind == "final":
+                # Always the last event; keep iterating so the stream closes cleanly
+                answer = event["text"]
+                continue
+            if kind == "thought":
+                status = f"💭 {event['text']}"
+            elif kind == "tool_start":
+                status = f"🔧 Running `{event['tool']}`..."
+            elif kind == "tool_end":
+                status = f"✅ `{event['tool']}` finished, thinking..."
+            elif kind == "answer_delta":
+                answer += event["text"]
+                status = answer + " ▌"
+            elif kind == "answer_reset":
+                answer = ""
+                status = "Thinking... 🧠"
+
+            now = time.monotonic()
+            if now - last_edit >= EDIT_INTERVAL:
+                last_edit = now
+                with span("discord.edit"):
+                    await placeholder.edit(content=status[:2000])
+        return answer
+
     async def start(self):
         print("[Discord] Starting...")
         try:
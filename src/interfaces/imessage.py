@@ -1,25 +1,47 @@
 import os
 import sqlite3
 import asyncio
-import subprocess
 from src.interfaces.base import BotInterface
+from src.interfaces.chatdb_watcher import ChatDB, ChatDBWatcher
+from src.interfaces.imessage_history import IMessageHistory, THINKING_TEXT
+from src.interfaces.imessage_sender import SendQueue
+from src.utils.tracing import span
+from src.utils import metrics
 
 DB_PATH = os.path.expanduser("~/Library/Messages/chat.db")
 
+# Fetch new messages since the last seen ROWID (text NOT NULL ensures it's a text message).
+# Our own sent messages are included too: they keep the cached thread history current.
+# Always the same SQL text, so the connection reuses one prepared statement.
+NEW_MESSAGES_QUERY = """
+    SELECT message.ROWID, message.text, handle.id, message.is_from_me, chat_message_join.chat_id
+    FROM message
+    LEFT JOIN handle ON message.handle_id = handle.ROWID
+    LEFT JOIN chat_message_join ON chat_message_join.message_id = message.ROWID
+    WHERE message.ROWID > ? AND message.text IS NOT NULL
+    ORDER BY message.ROWID ASC
+"""
+
 class IMessageInterface(BotInterface):
-    def __init__(self, agent):
+    def __init__(self, agent, db_path: str = DB_PATH, sender: SendQueue = None):
         super().__init__(agent)
         self.running = False
+        # In-flight message tasks, so the poller never waits on the agent
+        self._tasks = set()
+        # One read-only connection for the lifetime of the interface
+        self.db = ChatDB(db_path)
+        self.db_path = db_path
+        # Per-chat recent messages, fed by the poller
+        self.history = IMessageHistory(self.db)
+        # Ordered per recipient, concurrent across recipients, one long-lived script runner
+        self.sender = sender or SendQueue()
+        self.watcher = None
         self.last_message_id = self._get_last_message_id()
 
     def _get_last_message_id(self):
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute("SELECT MAX(ROWID) FROM message")
-            result = cursor.fetchone()
-            conn.close()
-            return result[0] if result and result[0] else 0
+            result = self.db.query("SELECT MAX(ROWID) FROM message")
+            return result[0][0] if result and result[0][0] else 0
         except sqlite3.OperationalError:
             print("[iMessage] Error access chat.db. Ensure Full Disk Access is granted to your terminal/IDE.")
             return 0
@@ -29,7 +51,9 @@ class IMessageInterface(BotInterface):
 
     async def start(self):
         self.running = True
-        print("[iMessage] Starting polling loop...")
+        # "auto" watches chat.db's WAL (inotify/kqueue); "poll" stats it with adaptive backoff
+        self.watcher = ChatDBWatcher(self.db_path, mode=os.getenv("IMESSAGE_WATCH_MODE", "auto"))
+        print(f"[iMessage] Watching chat.db for new messages ({self.watcher.mode})...")
         print(f"[iMessage] Initial last_message_id: {self.last_message_id}")
         
         while self.running:
@@ -37,40 +61,37 @@ class IMessageInterface(BotInterface):
                 await self._poll()
             except Exception as e:
                 print(f"[iMessage] Error in poll loop: {e}")
-            await asyncio.sleep(2)  # Poll every 2 seconds
+            if self.running:
+                await self.watcher.wait()
 
     async def stop(self):
         print("[iMessage] Stopping...")
         self.running = False
+        for task in list(self._tasks):
+            task.cancel()
+        if self.watcher:
+            self.watcher.close()
+        self.db.close()
+        await self.sender.close()
 
     async def _poll(self):
         try:
-            conn = sqlite3.connect(DB_PATH)
-            # Row factory to access columns by name if needed, but simple tuple is fine for now
-            cursor = conn.cursor()
-            
-            # Fetch new messages since last_message_id
-            # text NOT NULL ensuring it's a text message
-            query = """
-                SELECT message.ROWID, message.text, handle.id
-                FROM message
-                JOIN handle ON message.handle_id = handle.ROWID
-                WHERE message.ROWID > ? AND message.text IS NOT NULL AND message.is_from_me = 0
-                ORDER BY message.ROWID ASC
-            """
-            
-            cursor.execute(query, (self.last_message_id,))
-            rows = cursor.fetchall()
-            conn.close()
+            with span("imessage.poll") as poll_span:
+                rows = self.db.query(NEW_MESSAGES_QUERY, (self.last_message_id,))
+                poll_span.set(rows=len(rows))
 
             for row in rows:
-                msg_id, text, sender = row
+                msg_id, text, sender, is_from_me, chat_id = row
                 self.last_message_id = msg_id
+                if chat_id is not None:
+                    self.history.observe(chat_id, msg_id, text, bool(is_from_me))
                 
                 # Check for trigger
-                if "@Tinker" in text or "@tinker" in text:
+                if not is_from_me and sender and ("@Tinker" in text or "@tinker" in text):
                     print(f"[iMessage] Received from {sender}: {text}")
-                    await self._process_message(text, sender)
+                    task = asyncio.create_task(self._process_message(text, sender, chat_id, msg_id))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
 
         except sqlite3.OperationalError:
             print("[iMessage] Permission denied. Please grant Full Disk Access.")
@@ -78,9 +99,14 @@ class IMessageInterface(BotInterface):
         except Exception as e:
             print(f"[iMessage] Polling error: {e}")
 
-    async def _process_message(self, text: str, sender: str):
-        # Notify
-        await self._send_reply(sender, "Thinking... 🧠")
+    async def _process_message(self, text: str, sender: str, chat_id: int = None, msg_id: int = None):
+        metrics.MESSAGES.inc(interface="imessage")
+        with span("imessage.message", chat_id=chat_id):
+            await self._answer(text, sender, chat_id, msg_id)
+
+    async def _answer(self, text: str, sender: str, chat_id: int, msg_id: int):
+        # Notify without waiting for delivery; dropped if the answer is ready first
+        self._send_nowait(sender, THINKING_TEXT, ephemeral=True)
         
         # Clean text
         clean_text = text.replace("@Tinker", "").replace("@tinker", "").strip()
@@ -90,39 +116,25 @@ class IMessageInterface(BotInterface):
             return
 
         try:
-            # Agent processing
-            # For iMessage, history fetching is efficiently hard without more complex SQL queries
-            # For now, we will pass empty history, but we MUST pass the sender as user_id for Long-term memory
-            response = self.agent.process_message(clean_text, history=[], user_id=sender)
+            # Agent processing: earlier messages in this chat give context for follow-ups,
+            # and the sender is the user_id for long-term memory
+            history = self.history.get(chat_id, before=msg_id)
+            response = await self.agent.process_message_async(clean_text, history=history, user_id=sender)
             await self._send_reply(sender, response)
         except Exception as e:
             await self._send_reply(sender, f"Oops! Error: {e}")
 
     async def _send_reply(self, recipient: str, message: str):
-        # Use osascript to send iMessage
-        # Note: escaping quotes is important
-        safe_message = message.replace('"', '\\"')
-        
-        script = f'''
-        tell application "Messages"
-            set targetService to 1st service whose service type = iMessage
-            set targetBuddy to buddy "{recipient}" of targetService
-            send "{safe_message}" to targetBuddy
-        end tell
-        '''
-        
         try:
-            # run osascript
-            proc = await asyncio.create_subprocess_exec(
-                'osascript', '-e', script,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-            stdout, stderr = await proc.communicate()
-            
-            if proc.returncode != 0:
-                print(f"[iMessage] Error sending reply: {stderr.decode()}")
-            else:
-                print(f"[iMessage] Sent reply to {recipient}")
+            await self.sender.send(recipient, message)
+            print(f"[iMessage] Sent reply to {recipient}")
         except Exception as e:
-            print(f"[iMessage] Failed to execute osascript: {e}")
+            print(f"[iMessage] Error sending reply: {e}")
+
+    def _send_nowait(self, recipient: str, message: str, ephemeral: bool = False):
+        self.sender.submit(recipient, message, ephemeral=ephemeral).add_done_callback(self._log_send_error)
+
+    @staticmethod
+    def _log_send_error(future):
+        if not future.cancelled() and future.exception() is not None:
+            print(f"[iMessage] Error sending reply: {future.exception()}")
@@ -0,0 +1,67 @@
+import os
+from collections import deque
+from src.utils.cache import LRUCache
+from src.interfaces.chatdb_watcher import ChatDB
+
+# Placeholder sent while the agent works; not worth carrying as conversation context
+THINKING_TEXT = "Thinking... 🧠"
+
+# Last N text messages of one chat, newest first. Walks the (chat_id, message_id)
+# primary key of chat_message_join backwards, so it never scans the message table.
+RECENT_MESSAGES_QUERY = """
+    SELECT message.ROWID, message.is_from_me, message.text
+    FROM chat_message_join
+    JOIN message ON message.ROWID = chat_message_join.message_id
+    WHERE chat_message_join.chat_id = ? AND message.text IS NOT NULL
+    ORDER BY chat_message_join.message_id DESC
+    LIMIT ?
+"""
+
+
+class IMessageHistory:
+    """
+    Recent messages per chat, for giving the agent conversation context.
+
+    Each chat is loaded once with an indexed query for its last `limit` messages,
+    then kept current from the rows the poller already reads (`observe`), so
+    answering a message costs no extra chat.db query.
+    """
+
+    def __init__(self, db: ChatDB, limit: int = None, max_chats: int = 256):
+        self.db = db
+        self.limit = limit or int(os.getenv("IMESSAGE_HISTORY_LIMIT", "20"))
+        # chat_id -> deque of (rowid, is_from_me, text), oldest first
+        self._chats = LRUCache(max_entries=max_chats)
+
+    def _load(self, chat_id: int) -> deque:
+        messages = self._chats.get(chat_id)
+        if messages is None:
+            rows = self.db.query(RECENT_MESSAGES_QUERY, (chat_id, self.limit))
+            messages = deque(reversed(rows), maxlen=self.limit)
+            self._chats.set(chat_id, messages)
+        return messages
+
+    def observe(self, chat_id: int, rowid: int, text: str, is_from_me: bool):
+        """Appends a row seen by the poller to its chat, if that chat is cached."""
+        messages = self._chats.get(chat_id)
+        if messages is not None and (not messages or rowid > messages[-1][0]):
+            messages.append((rowid, is_from_me, text))
+
+    def get(self, chat_id: int, before: int = None) -> list:
+        """
+        Returns the chat's recent messages as user/assistant turns, oldest first,
+        excluding `before` and anything after it (i.e. the message being answered).
+        """
+        if chat_id is None:
+            return []
+        history = []
+        for rowid, is_from_me, text in self._load(chat_id):
+            if before is not None and rowid >= before:
+                break
+            if is_from_me:
+                # Tinker replies from this account, so our side of the chat is the assistant
+                if text != THINKING_TEXT:
+                    history.append({"role": "assistant", "content": text})
+            else:
+                history.append({"role": "user", "content": text.replace("@Tinker", "").replace("@tinker", "").strip()})
+        return history
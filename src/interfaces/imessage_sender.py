@@ -0,0 +1,194 @@
+import os
+import re
+import sys
+import json
+import asyncio
+import subprocess
+from collections import deque
+from src.utils.tracing import span
+
+# Tags each send's result line in the REPL output, so we know which request it answers
+MARKER = "TINKER_SEND"
+# JXA equivalent of the old `tell application "Messages" ... send` AppleScript, on one line
+SEND_JS = (
+    '(function(){{try{{var app=Application("Messages");'
+    'var svc=app.services.whose({{serviceType:"iMessage"}})[0];'
+    'app.send({message},{{to:svc.buddies.byName({recipient})}});'
+    'return "{marker} {seq} OK";}}catch(e){{return "{marker} {seq} ERR "+e;}}}})()\n'
+)
+
+
+class OsascriptRunner:
+    """
+    Sends iMessages through long-lived `osascript -l JavaScript -i` REPLs instead of
+    spawning a process per message. Each send is one line of JavaScript whose result
+    carries a numbered marker. A REPL that errors out or times out is killed and
+    replaced on the next send. Up to `processes` sends run at once.
+    """
+
+    def __init__(self, processes: int = 2, timeout: float = 20.0):
+        self.processes = processes
+        self.timeout = timeout
+        self._slots = None
+        self._idle = []
+        self._seq = 0
+
+    async def _spawn(self):
+        return await asyncio.create_subprocess_exec(
+            "osascript", "-l", "JavaScript", "-i",
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        )
+
+    async def _acquire(self):
+        # One slot per REPL; a discarded REPL frees its slot, so the next waiter starts a fresh one
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.processes)
+        await self._slots.acquire()
+        try:
+            while self._idle:
+                proc = self._idle.pop()
+                if proc.returncode is None:
+                    return proc
+            return await self._spawn()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, proc):
+        self._idle.append(proc)
+        self._slots.release()
+
+    def _discard(self, proc):
+        if proc.returncode is None:
+            proc.kill()
+        self._slots.release()
+
+    async def send(self, recipient: str, message: str):
+        proc = await self._acquire()
+        self._seq += 1
+        seq = self._seq
+        line = SEND_JS.format(message=json.dumps(message), recipient=json.dumps(recipient), marker=MARKER, seq=seq)
+        pattern = re.compile(rf"{MARKER} {seq} (OK|ERR)(.*?)\"?$")
+        try:
+            proc.stdin.write(line.encode("utf-8"))
+            await proc.stdin.drain()
+            while True:
+                raw = await asyncio.wait_for(proc.stdout.readline(), timeout=self.timeout)
+                if not raw:
+                    raise RuntimeError("osascript exited")
+                match = pattern.search(raw.decode("utf-8", errors="replace").strip())
+                if match:
+                    break
+        except BaseException:
+            self._discard(proc)
+            raise
+        self._release(proc)
+        if match.group(1) == "ERR":
+            raise RuntimeError(match.group(2).strip())
+
+    async def close(self):
+        while self._idle:
+            proc = self._idle.pop()
+            if proc.returncode is None:
+                proc.kill()
+
+
+class StubRunner:
+    """Local stand-in for Messages.app: records sends after a fixed delay (for Linux/testing)."""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.sent = []
+
+    async def send(self, recipient: str, message: str):
+        await asyncio.sleep(self.delay)
+        self.sent.append((recipient, message))
+
+    async def close(self):
+        pass
+
+
+def make_runner():
+    """IMESSAGE_SEND_RUNNER=osascript|stub; defaults to osascript on macOS and the stub elsewhere."""
+    kind = os.getenv("IMESSAGE_SEND_RUNNER", "osascript" if sys.platform == "darwin" else "stub")
+    if kind == "stub":
+        print("[iMessage] Using the stub send runner; replies are logged, not delivered.")
+        return StubRunner()
+    return OsascriptRunner(processes=int(os.getenv("IMESSAGE_SEND_PROCESSES", "2")))
+
+
+class _Outgoing:
+    def __init__(self, text: str, ephemeral: bool, future: asyncio.Future):
+        self.text = text
+        self.ephemeral = ephemeral
+        self.future = future
+
+
+class SendQueue:
+    """
+    Outbound iMessage queue.
+
+    - Messages to one recipient are delivered in order by that recipient's worker;
+      different recipients are served concurrently (up to `max_concurrency` sends).
+    - Messages to a recipient that queue up within `coalesce_window` (or while the
+      previous send is in flight) are merged into one send.
+    - An `ephemeral` message (the "Thinking..." ack) is dropped if the real reply is
+      already queued behind it.
+    """
+
+    def __init__(self, runner=None, coalesce_window: float = 0.15, max_concurrency: int = 4):
+        self.runner = runner or make_runner()
+        self.coalesce_window = coalesce_window
+        self.max_concurrency = max_concurrency
+        self._pending = {}
+        self._workers = {}
+        self._slots = None
+
+    def submit(self, recipient: str, text: str, ephemeral: bool = False) -> asyncio.Future:
+        """Queues a message; the returned future resolves once it was delivered (or failed)."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(recipient, deque()).append(_Outgoing(text, ephemeral, future))
+        if recipient not in self._workers:
+            self._workers[recipient] = asyncio.create_task(self._drain(recipient))
+        return future
+
+    async def send(self, recipient: str, text: str, ephemeral: bool = False):
+        await self.submit(recipient, text, ephemeral)
+
+    async def _drain(self, recipient: str):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        pending = self._pending[recipient]
+        try:
+            while pending:
+                # Give quick follow-ups a moment to join this send
+                await asyncio.sleep(self.coalesce_window)
+                batch = list(pending)
+                pending.clear()
+                kept = [m for n, m in enumerate(batch) if not (m.ephemeral and n < len(batch) - 1)]
+                error = None
+                try:
+                    async with self._slots:
+                        with span("imessage.send", messages=len(batch), sent=len(kept)):
+                            await self.runner.send(recipient, "\n\n".join(m.text for m in kept))
+                except Exception as e:
+                    error = e
+                for m in batch:
+                    if m.future.done():
+                        continue
+                    if error is not None:
+                        m.future.set_exception(error)
+                    else:
+                        m.future.set_result(None)
+        finally:
+            del self._workers[recipient]
+            if not pending:
+                self._pending.pop(recipient, None)
+
+    async def close(self, timeout: float = 5.0):
+        """Waits briefly for queued messages to go out, then stops the runner."""
+        if self._workers:
+            await asyncio.wait(list(self._workers.values()), timeout=timeout)
+        for task in list(self._workers.values()):
+            task.cancel()
+        await self.runner.close()
@@ -47,6 +47,17 @@ async def main():
         logger.error("No interfaces enabled. Exiting.")
         return
 
+    # Optional Prometheus endpoint on the same loop (/metrics, /healthz)
+    metrics_server = None
+    if os.getenv('METRICS_PORT'):
+        from src.utils import metrics
+        metrics.POOL_WAITING.fn = lambda: agent.pool.waiting
+        metrics.POOL_IN_FLIGHT.fn = lambda: agent.pool.in_flight
+        try:
+            metrics_server = await metrics.start_metrics_server(int(os.getenv('METRICS_PORT')))
+        except OSError as e:
+            logger.error(f"Failed to start metrics server: {e}")
+
     # Start all interfaces
     # For now, we only have Discord which is blocking-ish in its run/start method if using client.run
     # But we refactored to use client.start which is async.
@@ -61,6 +72,12 @@ async def main():
     finally:
         for interface in interfaces:
             await interface.stop()
+        if metrics_server:
+            metrics_server.close()
+            await metrics_server.wait_closed()
+        from src.tools.fetch import close_session
+        await close_session()
+        agent.pool.shutdown()
 
 if __name__ == '__main__':
     try:
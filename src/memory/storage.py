@@ -1,24 +1,67 @@
 import sqlite3
 import os
+import time
+import atexit
+import threading
+from src.utils.cache import LRUCache
 
 DB_PATH = os.path.expanduser("~/.tinker_memory.db")
 
 class MemoryManager:
+    """
+    SQLite-backed user preferences.
+
+    - Each thread keeps its own connection (WAL mode, tuned pragmas) instead of
+      opening one per call.
+    - Reads are served from an in-process cache of each active user's prefs,
+      loaded with a single query on first access and updated on every write.
+    - Writes are queued and committed in batches by a background writer
+      (every `flush_interval` seconds or `batch_size` writes). `flush()` forces it.
+    """
     _instance = None
+    _instance_lock = threading.Lock()
 
-    def __init__(self):
+    def __init__(self, db_path: str = DB_PATH, batch_size: int = 50, flush_interval: float = 0.05):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        # user_id -> {key: value}, for recently active users
+        self._cache = LRUCache(max_entries=1024)
+        self._cache_lock = threading.Lock()
+        # Striped per-user locks for cache misses
+        self._load_locks = [threading.Lock() for _ in range(64)]
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.RLock() # Re-entered by _user_prefs
+        self._wake = threading.Event()
         self._init_db()
+        self._writer = threading.Thread(target=self._writer_loop, name="tinker-memory-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.flush)
 
     @classmethod
     def get_instance(cls):
         if cls._instance is None:
-            cls._instance = MemoryManager()
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = MemoryManager()
         return cls._instance
 
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL") # Safe with WAL, avoids an fsync per commit
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA cache_size=-8000") # ~8MB page cache
+            self._local.conn = conn
+        return conn
+
     def _init_db(self):
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("""
+        conn = self._conn()
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS user_prefs (
                 user_id TEXT,
                 key TEXT,
@@ -27,25 +70,93 @@ class MemoryManager:
             )
         """)
         conn.commit()
-        conn.close()
+
+    def _user_prefs(self, user_id: str) -> dict:
+        """
+        Returns the cached prefs dict for a user, loading it on first access.
+        `_cache_lock` is only held for cache lookups and dict updates, so a slow load
+        (flush + SELECT) for one user doesn't stall cached reads for everyone else.
+        """
+        with self._cache_lock:
+            prefs = self._cache.get(user_id)
+        if prefs is not None:
+            return prefs
+        # One load per user at a time; different users load concurrently
+        with self._load_locks[hash(user_id) % len(self._load_locks)]:
+            with self._cache_lock:
+                prefs = self._cache.get(user_id)
+            if prefs is not None:
+                return prefs
+            # The user may have been evicted with writes queued or mid-commit. Holding the
+            # flush lock keeps the writer from having a batch in flight during the SELECT.
+            with self._flush_lock:
+                try:
+                    self.flush()
+                except sqlite3.Error as e:
+                    print(f"[Memory] Error flushing writes: {e}")
+                rows = self._conn().execute(
+                    "SELECT key, value FROM user_prefs WHERE user_id = ?", (user_id,)
+                ).fetchall()
+                prefs = dict(rows)
+                with self._cache_lock:
+                    # Queued writes (failed commits, or set_pref calls during the load) are newer than the rows
+                    with self._pending_lock:
+                        prefs.update((key, value) for uid, key, value in self._pending if uid == user_id)
+                    self._cache.set(user_id, prefs)
+        return prefs
 
     def set_pref(self, user_id: str, key: str, value: str):
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT OR REPLACE INTO user_prefs (user_id, key, value)
-            VALUES (?, ?, ?)
-        """, (user_id, key, value))
-        conn.commit()
-        conn.close()
+        self._user_prefs(user_id)
+        with self._cache_lock:
+            # Re-read: the dict may have been evicted (and a reload started) meanwhile
+            prefs = self._cache.get(user_id)
+            if prefs is not None:
+                prefs[key] = value
+            with self._pending_lock:
+                self._pending.append((user_id, key, value))
+                full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+        else:
+            self._wake.set()
 
     def get_pref(self, user_id: str, key: str) -> str:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT value FROM user_prefs
-            WHERE user_id = ? AND key = ?
-        """, (user_id, key))
-        result = cursor.fetchone()
-        conn.close()
-        return result[0] if result else None
+        prefs = self._user_prefs(user_id)
+        with self._cache_lock:
+            return prefs.get(key)
+
+    def get_all_prefs(self, user_id: str) -> dict:
+        prefs = self._user_prefs(user_id)
+        with self._cache_lock:
+            return dict(prefs)
+
+    def flush(self):
+        """Commits all queued writes in one transaction."""
+        with self._flush_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            conn = self._conn()
+            try:
+                with conn:
+                    conn.executemany("""
+                        INSERT OR REPLACE INTO user_prefs (user_id, key, value)
+                        VALUES (?, ?, ?)
+                    """, batch)
+            except sqlite3.Error:
+                # Keep the writes (in order) for the next attempt
+                with self._pending_lock:
+                    self._pending = batch + self._pending
+                raise
+
+    def _writer_loop(self):
+        while True:
+            self._wake.wait()
+            # Give concurrent writers a moment to join the batch
+            time.sleep(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[Memory] Error flushing writes: {e}")
@@ -0,0 +1,127 @@
+import os
+import re
+import zlib
+import hashlib
+import threading
+import numpy as np
+from src.memory.storage import DB_PATH, MemoryManager
+from src.utils.cache import LRUCache
+
+# One .npz index per user, stored next to the SQLite DB
+VECTOR_DIR = os.path.splitext(DB_PATH)[0] + "_vectors"
+DIM = 512
+
+def embed(text: str) -> np.ndarray:
+    """
+    CPU-only hashed embedding: word unigrams, bigrams and character trigrams are
+    hashed (with a sign bit) into DIM buckets and L2-normalized. Similar wording
+    ("fav color" / "favorite colour") lands on overlapping buckets.
+    """
+    vec = np.zeros(DIM, dtype=np.float32)
+    words = re.findall(r"[^\W_]+", text.lower()) # split snake_case keys too
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f"<{w}>"
+        grams += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    for g in grams:
+        h = zlib.crc32(g.encode("utf-8"))
+        vec[h % DIM] += 1.0 if (h >> 31) & 1 else -1.0
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+class _UserIndex:
+    def __init__(self, keys: list, texts: list, matrix: np.ndarray):
+        self.keys = keys
+        self.texts = texts
+        self.matrix = matrix
+
+
+class VectorStore:
+    """Per-user semantic memory: NumPy matrix of embeddings, persisted as .npz files."""
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, directory: str = VECTOR_DIR, max_users: int = 1024):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        # Recently used users' indexes; others are reloaded from their .npz
+        self._indexes = LRUCache(max_entries=max_users)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = VectorStore()
+        return cls._instance
+
+    def _path(self, user_id: str) -> str:
+        digest = hashlib.sha1(user_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.npz")
+
+    def _index(self, user_id: str) -> _UserIndex:
+        index = self._indexes.get(user_id)
+        if index is None:
+            index = self._load(user_id)
+            self._indexes.set(user_id, index)
+        return index
+
+    def _load(self, user_id: str) -> _UserIndex:
+        """
+        Reads the user's .npz and reconciles it with their stored prefs, which are the
+        source of truth: prefs missing from the index (stored before semantic memory
+        existed, or lost with a failed save) are embedded, and stale or deleted ones dropped.
+        """
+        prefs = MemoryManager.get_instance().get_all_prefs(user_id)
+        wanted = {k: f"{k}: {v}" for k, v in prefs.items()}
+        keys, texts, matrix = [], [], np.zeros((0, DIM), dtype=np.float32)
+        path = self._path(user_id)
+        if os.path.exists(path):
+            data = np.load(path)
+            keys, texts, matrix = [str(k) for k in data["keys"]], [str(t) for t in data["texts"]], data["matrix"]
+
+        keep = [i for i, (k, t) in enumerate(zip(keys, texts)) if wanted.get(k) == t]
+        index = _UserIndex([keys[i] for i in keep], [texts[i] for i in keep], matrix[keep])
+        indexed = set(index.keys)
+        missing = [k for k in wanted if k not in indexed]
+        if missing:
+            index.keys += missing
+            index.texts += [wanted[k] for k in missing]
+            index.matrix = np.vstack([index.matrix] + [embed(wanted[k])[None, :] for k in missing])
+        if missing or len(keep) != len(keys):
+            self._save(user_id, index)
+        return index
+
+    def _save(self, user_id: str, index: _UserIndex):
+        path = self._path(user_id)
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, keys=np.array(index.keys, dtype=str),
+                 texts=np.array(index.texts, dtype=str), matrix=index.matrix)
+        os.replace(tmp, path)
+
+    def add(self, user_id: str, key: str, text: str):
+        """Adds or replaces the memory stored under `key`."""
+        vec = embed(text)
+        with self._lock:
+            index = self._index(user_id)
+            if key in index.keys:
+                i = index.keys.index(key)
+                index.texts[i] = text
+                index.matrix[i] = vec
+            else:
+                index.keys.append(key)
+                index.texts.append(text)
+                index.matrix = np.vstack([index.matrix, vec[None, :]])
+            self._save(user_id, index)
+
+    def search(self, user_id: str, query: str, k: int = 3, min_score: float = 0.2) -> list:
+        """Returns up to k (key, text, score) tuples, most similar first."""
+        with self._lock:
+            index = self._index(user_id)
+            if not index.keys:
+                return []
+            scores = index.matrix @ embed(query)
+            top = np.argsort(-scores)[:k]
+            return [(index.keys[i], index.texts[i], float(scores[i])) for i in top if scores[i] >= min_score]
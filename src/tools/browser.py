@@ -1,39 +1,56 @@
 from playwright.async_api import async_playwright
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+from src.tools.memory_tools import current_user_id
+from src.utils.tracing import span
 import asyncio
+import os
+import time
 
-class BrowserManager:
-    _instance = None
-    _playwright = None
-    _browser = None
-    _context = None
-    _page = None
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 
-    @classmethod
-    async def get_instance(cls):
-        if cls._instance is None:
-            cls._instance = BrowserManager()
-            await cls._instance._start()
-        return cls._instance
+# Fast-load mode: the agent only reads text, so these are never worth downloading.
+# Override with BROWSER_BLOCK_RESOURCES (comma separated Playwright resource types).
+DEFAULT_BLOCKED_RESOURCES = "image,media,font"
 
-    async def _start(self):
-        self._playwright = await async_playwright().start()
-        # Launch headless by default
-        self._browser = await self._playwright.chromium.launch(headless=True)
-        self._context = await self._browser.new_context(
-            user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-        )
-        self._page = await self._context.new_page()
+# Ad/analytics hosts dropped in fast-load mode (subdomains included).
+# Extend with BROWSER_BLOCK_HOSTS (comma separated).
+TRACKER_HOSTS = [
+    "doubleclick.net",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googletagservices.com",
+    "adservice.google.com",
+    "amazon-adsystem.com",
+    "adnxs.com",
+    "criteo.com",
+    "taboola.com",
+    "outbrain.com",
+    "scorecardresearch.com",
+    "quantserve.com",
+    "hotjar.com",
+    "segment.io",
+    "mixpanel.com",
+    "connect.facebook.net",
+    "analytics.twitter.com",
+    "bat.bing.com",
+]
 
-    @classmethod
-    async def close(cls):
-        if cls._instance:
-            if cls._instance._context:
-                await cls._instance._context.close()
-            if cls._instance._browser:
-                await cls._instance._browser.close()
-            if cls._instance._playwright:
-                await cls._instance._playwright.stop()
-            cls._instance = None
+# page.goto wait strategies; "networkidle" is capped by BROWSER_NETWORKIDLE_CAP_MS
+WAIT_STRATEGIES = ("commit", "domcontentloaded", "load", "networkidle")
+
+def _csv_env(name: str, default: str = "") -> list:
+    return [item.strip() for item in os.getenv(name, default).split(",") if item.strip()]
+
+def _is_tracker(url: str, hosts: list) -> bool:
+    host = urlparse(url).hostname or ""
+    return any(host == h or host.endswith("." + h) for h in hosts)
+
+class BrowserSession:
+    """An isolated browser context and page, leased to one user (or task) at a time."""
 
     DOMAIN_BLOCKLIST = [
         "facebook.com",
@@ -46,10 +63,24 @@ class BrowserManager:
         "paypal.com"
     ]
 
+    def __init__(self, context, page, wait_until: str = "domcontentloaded", networkidle_cap_ms: int = 3000):
+        self._context = context
+        self._page = page
+        self.wait_until = wait_until
+        self.networkidle_cap_ms = networkidle_cap_ms
+        self.key = None
+        self.last_used = time.monotonic()
+        # Held while leased, so one user's actions never interleave on the page
+        self.lock = asyncio.Lock()
+
+    async def close(self):
+        try:
+            await self._context.close()
+        except Exception as e:
+            print(f"[Browser] Error closing context: {e}")
+
     async def navigate(self, url: str) -> str:
         """Navigates to the specified URL."""
-        if not self._page:
-            await self._start()
         try:
             # Check Blocklist
             for domain in self.DOMAIN_BLOCKLIST:
@@ -59,8 +90,18 @@ class BrowserManager:
             # Ensure protocol
             if not url.startswith('http'):
                 url = 'https://' + url
-            
-            await self._page.goto(url, wait_until="domcontentloaded", timeout=30000)
+
+            with span("browser.goto", wait_until=self.wait_until):
+                if self.wait_until == "networkidle":
+                    # Full network idle can take forever on chatty pages: wait for the DOM,
+                    # then give the network a bounded grace period to settle.
+                    await self._page.goto(url, wait_until="domcontentloaded", timeout=30000)
+                    try:
+                        await self._page.wait_for_load_state("networkidle", timeout=self.networkidle_cap_ms)
+                    except Exception:
+                        pass # Cap reached; the DOM is already usable
+                else:
+                    await self._page.goto(url, wait_until=self.wait_until, timeout=30000)
             title = await self._page.title()
             return f"Navigated to {url}. Title: {title}"
         except Exception as e:
@@ -68,7 +109,7 @@ class BrowserManager:
 
     async def click(self, selector: str) -> str:
         """Clicks an element matching the selector."""
-        if not self._page:
+        if self._page.url == "about:blank":
             return "Error: Browser not started. Navigate first."
         try:
             await self._page.click(selector, timeout=5000)
@@ -78,7 +119,7 @@ class BrowserManager:
 
     async def fill_form(self, selector: str, value: str) -> str:
         """Fills a form field matching the selector with the given value."""
-        if not self._page:
+        if self._page.url == "about:blank":
             return "Error: Browser not started. Navigate first."
         try:
             await self._page.fill(selector, value, timeout=5000)
@@ -88,7 +129,7 @@ class BrowserManager:
 
     async def extract_text(self, selector: str = "body") -> str:
         """Extracts text from the element matching the selector (defaults to body)."""
-        if not self._page:
+        if self._page.url == "about:blank":
             return "Error: Browser not started. Navigate first."
         try:
             if selector == "body":
@@ -104,40 +145,292 @@ class BrowserManager:
 
     async def screenshot(self) -> str:
         """Takes a screenshot of the current page."""
-        if not self._page:
+        if self._page.url == "about:blank":
             return "Error: Browser not started."
         try:
-            # Save to a temporary path (or return bytes? For now, simplistic path)
-            path = "screenshot.png"
+            # One file per session so concurrent users don't overwrite each other
+            safe_key = "".join(c if c.isalnum() else "_" for c in str(self.key))
+            path = f"screenshot_{safe_key}.png"
             await self._page.screenshot(path=path)
             return f"Screenshot saved to {path} (local)"
         except Exception as e:
             return f"Error taking screenshot: {e}"
 
+
+class BrowserManager:
+    """
+    Owns the single Chromium process and a pool of isolated sessions on top of it.
+
+    Sessions are keyed by user (or task) and leased exclusively. The pool holds at most
+    BROWSER_MAX_CONTEXTS sessions; when full, the least recently used idle session is
+    evicted. BROWSER_WARM_PAGES fresh sessions are kept pre-created so a new user's
+    first navigation doesn't pay for context/page creation.
+
+    With BROWSER_FAST_LOAD (default on), every context aborts requests for blocked
+    resource types and tracker hosts, since the agent only ever reads text.
+
+    A lease only covers one tool call, so the agent wraps each task in `task_scope(key)`:
+    while a key has a task in flight its session is never evicted, and a later
+    click/extract_text finds the page the task navigated to.
+    """
+    _instance = None
+    # key -> tasks in flight; class-level so scopes can open before the browser starts
+    _active_tasks = Counter()
+
+    def __init__(self):
+        self.max_contexts = int(os.getenv("BROWSER_MAX_CONTEXTS", "4"))
+        self.warm_pages = min(int(os.getenv("BROWSER_WARM_PAGES", "1")), self.max_contexts)
+        self.idle_seconds = float(os.getenv("BROWSER_IDLE_SECONDS", "300"))
+        self.fast_load = os.getenv("BROWSER_FAST_LOAD", "true").lower() == "true"
+        self.blocked_resources = set(_csv_env("BROWSER_BLOCK_RESOURCES", DEFAULT_BLOCKED_RESOURCES))
+        self.blocked_hosts = TRACKER_HOSTS + _csv_env("BROWSER_BLOCK_HOSTS")
+        self.wait_until = os.getenv("BROWSER_WAIT_UNTIL", "domcontentloaded")
+        if self.wait_until not in WAIT_STRATEGIES:
+            print(f"[Browser] Unknown BROWSER_WAIT_UNTIL '{self.wait_until}', using domcontentloaded.")
+            self.wait_until = "domcontentloaded"
+        self.networkidle_cap_ms = int(os.getenv("BROWSER_NETWORKIDLE_CAP_MS", "3000"))
+        self._playwright = None
+        self._browser = None
+        self._ready = None
+        # key -> BrowserSession, least recently used first
+        self._sessions = OrderedDict()
+        # Pre-created sessions not yet assigned to a key
+        self._warm = []
+        # Sessions being created right now (count against max_contexts)
+        self._creating = 0
+        # Keys whose session is being created; other callers for them wait
+        self._creating_keys = set()
+        # Guards the bookkeeping above; Playwright calls happen outside it
+        self._changed = asyncio.Condition()
+
+    @classmethod
+    async def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = BrowserManager()
+            # Concurrent first callers all wait on the same startup task
+            cls._instance._ready = asyncio.ensure_future(cls._instance._start())
+        inst = cls._instance
+        try:
+            await inst._ready
+        except Exception:
+            # Let the next call try a fresh start instead of re-raising this failure forever
+            if cls._instance is inst:
+                cls._instance = None
+            raise
+        return inst
+
+    async def _start(self):
+        try:
+            self._playwright = await async_playwright().start()
+            # Launch headless by default
+            self._browser = await self._playwright.chromium.launch(headless=True)
+        except Exception:
+            if self._playwright:
+                await self._playwright.stop()
+            raise
+        await self._fill_warm()
+
+    async def _new_session(self) -> BrowserSession:
+        context = await self._browser.new_context(user_agent=USER_AGENT)
+        if self.fast_load:
+            await context.route("**/*", self._filter_request)
+        page = await context.new_page()
+        return BrowserSession(context, page, self.wait_until, self.networkidle_cap_ms)
+
+    async def _filter_request(self, route):
+        request = route.request
+        if request.resource_type in self.blocked_resources or _is_tracker(request.url, self.blocked_hosts):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    def _size(self) -> int:
+        return len(self._sessions) + len(self._warm) + self._creating
+
+    async def _fill_warm(self):
+        while len(self._warm) < self.warm_pages and self._size() < self.max_contexts:
+            self._creating += 1
+            try:
+                session = await self._new_session()
+            finally:
+                self._creating -= 1
+            async with self._changed:
+                self._warm.append(session)
+                self._changed.notify_all()
+
+    @classmethod
+    async def close(cls):
+        if cls._instance:
+            inst = cls._instance
+            cls._instance = None
+            for session in list(inst._sessions.values()) + inst._warm:
+                await session.close()
+            inst._sessions.clear()
+            inst._warm.clear()
+            if inst._browser:
+                await inst._browser.close()
+            if inst._playwright:
+                await inst._playwright.stop()
+
+    async def acquire(self, key: str) -> BrowserSession:
+        """
+        Leases the session for `key`, creating one (or taking a warm one) if needed.
+        Waits while another caller holds the same key, or while the pool is full of busy sessions.
+        Only bookkeeping happens under the pool's lock; contexts are created and closed outside it.
+        """
+        while True:
+            reserved = False
+            async with self._changed:
+                stale = self._pop_idle()
+                if stale:
+                    self._changed.notify_all()
+                session = self._sessions.get(key)
+                if session is None and key not in self._creating_keys:
+                    session, victim, reserved = self._claim_slot(key)
+                if session is not None and not session.lock.locked():
+                    self._sessions.move_to_end(key)
+                    await session.lock.acquire()
+                    session.last_used = time.monotonic()
+                    break
+                if not reserved and not stale:
+                    # Same key is busy (or being created), or the pool is full of busy sessions
+                    await self._changed.wait()
+                    continue
+            # Evicted idle sessions freed slots; retry once they're closed
+            await self._close_all(stale)
+            if reserved:
+                break
+
+        await self._close_all(stale)
+        if not reserved:
+            return session
+        # A slot was reserved for this key: create its session outside the lock
+        try:
+            if victim is not None:
+                await victim.close()
+            session = await self._new_session()
+        except BaseException:
+            async with self._changed:
+                self._creating -= 1
+                self._creating_keys.discard(key)
+                self._changed.notify_all()
+            raise
+        async with self._changed:
+            self._creating -= 1
+            self._creating_keys.discard(key)
+            session.key = key
+            self._sessions[key] = session
+            await session.lock.acquire()
+            session.last_used = time.monotonic()
+            self._changed.notify_all()
+        return session
+
+    def _claim_slot(self, key: str):
+        """
+        Assigns a slot to a new key (call under the lock). Returns (session, victim, reserved):
+        a warm session ready to lease, or reserved=True when a session must be created after
+        closing `victim` (None if the pool had room). All empty if the pool is full of sessions
+        that are leased or belong to a task in flight.
+        """
+        if self._warm:
+            session = self._warm.pop()
+            asyncio.ensure_future(self._fill_warm())
+            session.key = key
+            self._sessions[key] = session
+            return session, None, False
+        victim = None
+        if self._size() >= self.max_contexts:
+            victim_key = next((k for k, s in self._sessions.items() if self._evictable(k, s)), None)
+            if victim_key is None:
+                return None, None, False
+            victim = self._sessions.pop(victim_key)
+        self._creating += 1
+        self._creating_keys.add(key)
+        return None, victim, True
+
+    def _pop_idle(self) -> list:
+        """Removes sessions idle past `idle_seconds` from the pool (call under the lock); the caller closes them."""
+        now = time.monotonic()
+        stale = [
+            k for k, s in self._sessions.items()
+            if self._evictable(k, s) and now - s.last_used > self.idle_seconds
+        ]
+        return [self._sessions.pop(k) for k in stale]
+
+    def _evictable(self, key: str, session: BrowserSession) -> bool:
+        """Not leased right now, and no task of its key is in flight (between tool calls)."""
+        return not session.lock.locked() and not self._active_tasks[key]
+
+    @classmethod
+    @asynccontextmanager
+    async def task_scope(cls, key: str):
+        """`async with BrowserManager.task_scope(user_id):` around a task keeps its session alive."""
+        cls._active_tasks[key] += 1
+        try:
+            yield
+        finally:
+            cls._active_tasks[key] -= 1
+            if not cls._active_tasks[key]:
+                del cls._active_tasks[key]
+                inst = cls._instance
+                if inst is not None and inst._ready is not None and inst._ready.done():
+                    # Its session may now be evicted for a caller waiting on a full pool
+                    async with inst._changed:
+                        inst._changed.notify_all()
+
+    @staticmethod
+    async def _close_all(sessions: list):
+        for session in sessions:
+            await session.close()
+        sessions.clear()
+
+    async def release(self, session: BrowserSession):
+        """Returns a leased session to the pool."""
+        async with self._changed:
+            session.last_used = time.monotonic()
+            if session.lock.locked():
+                session.lock.release()
+            self._changed.notify_all()
+
+    @asynccontextmanager
+    async def lease(self, key: str):
+        """`async with manager.lease(key) as session:` — acquire/release around a block."""
+        with span("browser.acquire"):
+            session = await self.acquire(key)
+        try:
+            yield session
+        finally:
+            await self.release(session)
+
 # Tool wrappers
-browser = BrowserManager()
+# Each user gets their own session, so concurrent users never share cookies or tabs.
 
 async def navigate(url: str) -> str:
     """Navigates the browser to the specified URL."""
     inst = await BrowserManager.get_instance()
-    return await inst.navigate(url)
+    async with inst.lease(current_user_id.get()) as session:
+        return await session.navigate(url)
 
 async def click(selector: str) -> str:
     """Clicks an element on the current page matching the CSS selector."""
     inst = await BrowserManager.get_instance()
-    return await inst.click(selector)
+    async with inst.lease(current_user_id.get()) as session:
+        return await session.click(selector)
 
 async def fill_form(selector: str, value: str) -> str:
     """Fills a form input matching the selector with the given text value."""
     inst = await BrowserManager.get_instance()
-    return await inst.fill_form(selector, value)
+    async with inst.lease(current_user_id.get()) as session:
+        return await session.fill_form(selector, value)
 
 async def extract_text(selector: str = "body") -> str:
     """Extracts text content from the current page. Optional: provide a CSS selector."""
     inst = await BrowserManager.get_instance()
-    return await inst.extract_text(selector)
+    async with inst.lease(current_user_id.get()) as session:
+        return await session.extract_text(selector)
 
 async def screenshot() -> str:
     """Takes a screenshot of the current page."""
     inst = await BrowserManager.get_instance()
-    return await inst.screenshot()
+    async with inst.lease(current_user_id.get()) as session:
+        return await session.screenshot()
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import aiohttp
+from html.parser import HTMLParser
+from src.tools.browser import BrowserManager, BrowserSession
+from src.tools.memory_tools import current_user_id
+from src.utils.tracing import annotate
+from src.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+MAX_CHARS = 2000 # Same budget as extract_text
+MAX_BYTES = 2 * 1024 * 1024
+# Pages with less readable text than this are assumed to be rendered client-side
+MIN_TEXT_CHARS = 200
+JS_MARKERS = [
+    "enable javascript",
+    "javascript is required",
+    "javascript is disabled",
+    "requires javascript",
+    '<div id="root"></div>',
+    '<div id="app"></div>',
+    '<div id="__next"></div>',
+]
+
+_session = None
+_session_loop = None
+
+def _get_session() -> aiohttp.ClientSession:
+    """Returns the shared, connection-pooled HTTP session for the running loop."""
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        _session_loop = loop
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=20, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=10),
+            headers={"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"},
+        )
+    return _session
+
+async def close_session():
+    global _session
+    if _session and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+class _ContentExtractor(HTMLParser):
+    """
+    Readability-style text extraction: drops scripts and page chrome (nav, header,
+    footer, ...) and keeps text blocks, remembering which ones sit inside <article>/<main>.
+    """
+    SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "iframe", "nav", "header", "footer", "aside", "form", "button"}
+    BLOCK_TAGS = {"p", "div", "section", "article", "main", "li", "ul", "ol", "tr", "table", "br",
+                  "h1", "h2", "h3", "h4", "h5", "h6", "pre", "blockquote", "dd", "dt", "figcaption"}
+    MAIN_TAGS = {"article", "main"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.blocks = [] # (text, inside_main)
+        self._buf = []
+        self._skip_depth = 0
+        self._main_depth = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title":
+            self._in_title = True
+        elif tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self._flush()
+        if tag in self.MAIN_TAGS:
+            self._main_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+        elif tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.BLOCK_TAGS:
+            self._flush()
+        if tag in self.MAIN_TAGS:
+            self._flush()
+            self._main_depth = max(0, self._main_depth - 1)
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif not self._skip_depth:
+            self._buf.append(data)
+
+    def _flush(self):
+        text = " ".join("".join(self._buf).split())
+        self._buf = []
+        if text:
+            self.blocks.append((text, self._main_depth > 0))
+
+    def main_text(self) -> str:
+        self._flush()
+        main = [text for text, in_main in self.blocks if in_main]
+        if sum(len(t) for t in main) >= MIN_TEXT_CHARS:
+            return "\n".join(main)
+        # No usable <article>/<main>: keep sentence-like blocks, skipping menu crumbs
+        content = [text for text, _ in self.blocks if len(text) >= 40 or text.endswith((".", "?", "!", ":"))]
+        return "\n".join(content or [text for text, _ in self.blocks])
+
+
+def _needs_javascript(html: str, text: str) -> bool:
+    if len(text) < MIN_TEXT_CHARS:
+        return True
+    lowered = html.lower()
+    return len(text) < 4 * MIN_TEXT_CHARS and any(marker in lowered for marker in JS_MARKERS)
+
+def _format(url: str, title: str, text: str) -> str:
+    body = text[:MAX_CHARS] + ("..." if len(text) > MAX_CHARS else "")
+    return f"Fetched {url}. Title: {title.strip()}\n\n{body}"
+
+async def _fetch_http(url: str):
+    """Returns (title, text) for static pages, or None if the page needs a real browser."""
+    async with _get_session().get(url, allow_redirects=True) as resp:
+        if resp.status >= 400:
+            return None
+        content_type = resp.headers.get("Content-Type", "")
+        raw = await resp.content.read(MAX_BYTES)
+        charset = resp.charset or "utf-8"
+    html = raw.decode(charset, errors="replace")
+    if "text/plain" in content_type:
+        return "", html
+    if "html" not in content_type:
+        return None
+
+    parser = _ContentExtractor()
+    parser.feed(html)
+    parser.close()
+    text = parser.main_text()
+    if _needs_javascript(html, text):
+        return None
+    return parser.title, text
+
+async def fetch_page(url: str) -> str:
+    """Reads the main text of a web page quickly over plain HTTP, falling back to the full browser for JavaScript-heavy pages. Prefer this over navigate + extract_text when you only need to read a page; use navigate when you need to click or fill forms."""
+    for domain in BrowserSession.DOMAIN_BLOCKLIST:
+        if domain in url:
+            return f"Error: Navigation to {domain} is blocked for safety reasons."
+    if not url.startswith('http'):
+        url = 'https://' + url
+
+    try:
+        result = await _fetch_http(url)
+    except Exception as e:
+        logger.debug("HTTP fetch failed for %s: %s", url, e)
+        annotate(http_error=e.__class__.__name__)
+        result = None
+    if result:
+        metrics.FETCHES.inc(via="http")
+        annotate(via="http")
+        title, text = result
+        return _format(url, title, text)
+
+    # Escalate to Chromium; this also leaves the user's tab on the page for follow-up clicks
+    logger.debug("Falling back to browser for %s", url)
+    metrics.FETCHES.inc(via="browser")
+    annotate(via="browser")
+    inst = await BrowserManager.get_instance()
+    async with inst.lease(current_user_id.get()) as session:
+        nav = await session.navigate(url)
+        if nav.startswith("Error"):
+            metrics.FETCH_ERRORS.inc()
+            return nav
+        text = await session.extract_text()
+    return f"{nav}\n\n{text}"
@@ -1,4 +1,5 @@
 from src.memory.storage import MemoryManager
+from src.memory.vector_store import VectorStore
 
 # Note: In a real multi-user scenario, we need a way to pass the current user_id 
 # to these tools implicitly or explicitly. For now, since the Agent loop is 
@@ -18,6 +19,10 @@ import contextvars
 
 current_user_id = contextvars.ContextVar("current_user_id", default="default_user")
 
+# Similarity a stored memory needs before `recall` offers it for a key it doesn't have;
+# differently formatted keys score ~0.65+, merely related ones up to ~0.5
+RECALL_MIN_SCORE = 0.6
+
 def set_current_user(user_id: str):
     current_user_id.set(user_id)
 
@@ -26,6 +31,7 @@ def remember(key: str, value: str) -> str:
     user = current_user_id.get()
     storage = MemoryManager.get_instance()
     storage.set_pref(user, key, value)
+    VectorStore.get_instance().add(user, key, f"{key}: {value}")
     return f"I have remembered that {key} is {value}."
 
 def recall(key: str) -> str:
@@ -35,5 +41,19 @@ def recall(key: str) -> str:
     val = storage.get_pref(user, key)
     if val:
         return f"{key} is {val}."
-    else:
-        return f"I don't have any memory of {key}."
+    # The key may be worded differently than when it was stored ("Favorite Color" for
+    # favorite_color). Only a near-identical match counts, and it's labelled as such:
+    # related keys share words ("favorite_food" vs "favorite_color") and score well too.
+    matches = VectorStore.get_instance().search(user, key, k=1, min_score=RECALL_MIN_SCORE)
+    if matches:
+        stored_key, _, _ = matches[0]
+        return f"I have nothing stored as {key}. Closest stored memory: {stored_key}: {storage.get_pref(user, stored_key)}."
+    return f"I don't have any memory of {key}."
+
+def search_memory(query: str) -> str:
+    """Searches everything remembered about the user by meaning and returns the closest facts. Use this when unsure of the exact key."""
+    user = current_user_id.get()
+    matches = VectorStore.get_instance().search(user, query, k=3)
+    if not matches:
+        return f"I don't have any memory related to {query}."
+    return "\n".join(f"- {text} (similarity {score:.2f})" for _, text, score in matches)
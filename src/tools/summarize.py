@@ -1,5 +1,149 @@
 import os
-from groq import Groq
+import re
+import time
+import zlib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from src.agent.llm_gateway import LLMGateway
+from src.agent.model_scheduler import SMALL_MODEL
+from src.agent.prompt_builder import CHARS_PER_TOKEN, count_tokens
+from src.agent.task_budget import BudgetExceeded, current_budget
+from src.utils.cache import PersistentCache, make_key
+from src.utils.tracing import annotate
+
+# Input tokens per LLM call; longer pages are summarized chunk by chunk, then combined
+CHUNK_TOKENS = int(os.getenv("SUMMARIZE_CHUNK_TOKENS", "2000"))
+# Hard cap on chunks per page; the rate limit and timeout usually allow fewer (see chunk_limit)
+MAX_CHUNKS = int(os.getenv("SUMMARIZE_MAX_CHUNKS", "24"))
+# The tool's timeout (registered with the agent); chunk calls stop being started before it
+TIMEOUT = float(os.getenv("SUMMARIZE_TIMEOUT_S", "30"))
+# Share of the small model's per-minute token quota one page may use; the rest is left for the agent
+QUOTA_SHARE = float(os.getenv("SUMMARIZE_QUOTA_SHARE", "0.5"))
+# Prompt overhead and output per chunk call, on top of the chunk itself
+CHUNK_CALL_TOKENS = 400
+# Chunk calls in flight per page; the gateway's rate limits still apply on top
+_chunk_pool = ThreadPoolExecutor(max_workers=int(os.getenv("SUMMARIZE_CONCURRENCY", "4")), thread_name_prefix="tinker-summarize")
+
+SYSTEM_PROMPT = "You are a helpful assistant that summarizes text. Keep it concise and capture the main points."
+CHUNK_PROMPT = "This is one part of a longer document. Summarize this part, keeping names, numbers and key facts:\n\n{text}"
+REDUCE_PROMPT = "These are summaries of consecutive parts of one document. Combine them into a single concise summary of the whole document:\n\n{text}"
+
+# Boundaries to split on, coarsest first: paragraphs, lines, sentences, words
+SEPARATORS = (r"\n\s*\n", r"\n", r"(?<=[.!?])\s+", r"\s+")
+
+def split_text(text: str, max_tokens: int = CHUNK_TOKENS) -> list:
+    """
+    Splits text into chunks of at most `max_tokens`, breaking on the coarsest
+    structure that fits (paragraphs, then lines, sentences, words) and packing
+    neighbouring pieces together. Besides the size limit, a chunk also ends after
+    any piece whose hash picks it as a boundary, so boundaries depend on content
+    rather than offsets: an edit only changes the chunks around it, and the rest
+    keep hitting the per-chunk cache.
+    """
+    def pieces(part: str, level: int) -> list:
+        if count_tokens(part) <= max_tokens:
+            return [part]
+        if level == len(SEPARATORS):
+            limit = max_tokens * CHARS_PER_TOKEN
+            return [part[i:i + limit] for i in range(0, len(part), limit)]
+        out = []
+        for piece in re.split(SEPARATORS[level], part):
+            if piece.strip():
+                out.extend(pieces(piece, level + 1))
+        return out
+
+    chunks, current = [], ""
+    for piece in pieces(text.strip(), 0):
+        candidate = f"{current}\n\n{piece}" if current else piece
+        if current and count_tokens(candidate) > max_tokens:
+            chunks.append(current)
+            candidate = piece
+        current = candidate
+        if count_tokens(current) >= max_tokens // 2 and zlib.crc32(piece.encode("utf-8")) % 4 == 0:
+            chunks.append(current)
+            current = ""
+    if current:
+        chunks.append(current)
+    return chunks
+
+def chunk_limit(seconds: float) -> int:
+    """
+    How many chunk calls fit in `seconds` under the small model's token quota
+    (one minute of burst plus the refill, times QUOTA_SHARE), keeping one call's
+    worth for the reduce step. Never more than MAX_CHUNKS.
+    """
+    _, tpm = LLMGateway.get_instance().primary.limits_for(SMALL_MODEL)
+    affordable = tpm * (1 + seconds / 60) * QUOTA_SHARE
+    per_call = CHUNK_TOKENS + CHUNK_CALL_TOKENS
+    return max(1, min(MAX_CHUNKS, int(affordable // per_call) - 1))
+
+def _deadline() -> float:
+    """When this call's summarization must be done: the tool timeout, cut to the task's budget."""
+    timeout = TIMEOUT
+    budget = current_budget.get()
+    if budget is not None:
+        timeout = min(timeout, budget.tool_timeout(timeout))
+    return time.monotonic() + max(timeout, 0)
+
+def _map(func, items: list, deadline: float) -> list:
+    """
+    Runs func over items on the chunk pool, in the caller's context (e.g. its task budget).
+    Items not started (or cut off by the rate limiter) before `deadline` come back as None,
+    so a timed-out summary stops spending the shared quota.
+    """
+    def run(item):
+        if time.monotonic() >= deadline:
+            return None
+        try:
+            return func(item)
+        except BudgetExceeded:
+            return None
+
+    futures = [_chunk_pool.submit(contextvars.copy_context().run, run, item) for item in items]
+    return [f.result() for f in futures]
+
+def _complete(prompt: str, cache_tag: str, max_tokens: int, deadline: float = None) -> str:
+    """One cached summarization call, keyed by the exact prompt it sends."""
+    cache = PersistentCache.get_instance()
+    cache_key = make_key(cache_tag, SMALL_MODEL, prompt)
+    cached = cache.get(cache_key)
+    if cached:
+        return cached
+
+    completion = LLMGateway.get_instance().chat(
+        model=SMALL_MODEL, # Fast, cheap tier is plenty for summaries
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ],
+        temperature=0.7,
+        max_tokens=max_tokens,
+        top_p=1,
+        stream=False,
+        stop=None,
+        deadline=deadline,
+    )
+    summary = completion.choices[0].message.content
+    cache.set(cache_key, summary)
+    return summary
+
+def _reduce(summaries: list, deadline: float) -> str:
+    """Combines partial summaries, in rounds if they don't fit one call."""
+    while len(summaries) > 1:
+        groups = split_text("\n\n".join(summaries), CHUNK_TOKENS)
+        if len(groups) == 1:
+            try:
+                return _complete(REDUCE_PROMPT.format(text=groups[0]), "summarize_reduce", 500, deadline)
+            except BudgetExceeded:
+                return groups[0]
+        reduced = _map(
+            lambda group: _complete(REDUCE_PROMPT.format(text=group), "summarize_reduce", 300, deadline), groups, deadline
+        )
+        if None in reduced:
+            # Out of time mid-round: the groups are a shorter read than nothing
+            return "\n\n".join(r if r is not None else g for r, g in zip(reduced, groups))
+        summaries = reduced
+    return summaries[0]
 
 def summarize_page(content: str) -> str:
     """
@@ -14,30 +158,38 @@ def summarize_page(content: str) -> str:
     api_key = os.getenv("GROQ_API_KEY")
     if not api_key:
         return "Error: GROQ_API_KEY not found in environment variables."
-        
-    client = Groq(api_key=api_key)
-    
+
+    chunks = split_text(content)
+    annotate(chunks=len(chunks))
+    if not chunks:
+        return "Error: nothing to summarize."
+
+    deadline = _deadline()
     try:
-        completion = client.chat.completions.create(
-            model="llama3-8b-8192", # Using a fast, free model
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful assistant that summarizes text. Keep it concise and capture the main points."
-                },
-                {
-                    "role": "user",
-                    "content": f"Summarize the following text:\n\n{content[:10000]}" # Limit context window
-                }
-            ],
-            temperature=0.7,
-            max_tokens=500,
-            top_p=1,
-            stream=False,
-            stop=None,
+        if len(chunks) == 1:
+            return _complete(f"Summarize the following text:\n\n{chunks[0]}", "summarize", 500, deadline)
+
+        # Map: summarize as many chunks concurrently as the quota allows in the time
+        # (each cached by its own content hash), leaving a third of the time to reduce
+        limit = chunk_limit(deadline - time.monotonic())
+        total = len(chunks)
+        map_deadline = deadline - (deadline - time.monotonic()) / 3
+        partials = _map(
+            lambda chunk: _complete(CHUNK_PROMPT.format(text=chunk), "summarize_chunk", 300, map_deadline),
+            chunks[:limit], map_deadline,
         )
-        
-        return completion.choices[0].message.content
+        # Keep the leading run of finished chunks so the summary covers a contiguous start
+        done = partials.index(None) if None in partials else len(partials)
+        annotate(chunks_summarized=done)
+        if not done:
+            return "Error gathering summary: ran out of time before any part was summarized."
+        # Reduce: merge the partial summaries into one
+        summary = _reduce(partials[:done], deadline)
+        if done < total:
+            summary += f"\n\n(Summary covers the first {done} of {total} sections; the rest was not included.)"
+        return summary
+    except BudgetExceeded:
+        return "Error gathering summary: ran out of time."
     except Exception as e:
         return f"Error gathering summary: {str(e)}"
 
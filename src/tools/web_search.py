@@ -1,31 +1,88 @@
+import os
+import logging
+import threading
+from concurrent.futures import Future
 from duckduckgo_search import DDGS
+from src.utils.cache import LRUCache
+from src.utils.tracing import annotate
+
+logger = logging.getLogger(__name__)
+
+# Formatted results per (normalized query, max_results); hot queries skip DuckDuckGo entirely
+_results = LRUCache(max_entries=256, ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL", "600")))
+# Searches currently running, so concurrent identical queries share one request
+_inflight = {}
+_inflight_lock = threading.Lock()
+# DDGS keeps an HTTP session; reuse one per worker thread instead of one per call
+_local = threading.local()
+
+def _normalize(query: str) -> str:
+    return " ".join(query.lower().split())
+
+def _client() -> DDGS:
+    if getattr(_local, "ddgs", None) is None:
+        _local.ddgs = DDGS()
+    return _local.ddgs
 
 def web_search(query: str, max_results: int = 5) -> str:
     """
     Performs a web search using DuckDuckGo and returns a formatted string of results.
-    
+
     Args:
         query: The search query.
         max_results: The maximum number of results to return.
-        
+
     Returns:
         A formatted string containing titles, URLs, and snippets of the search results.
     """
-    print(f"DEBUG: Searching for '{query}'...")
+    max_results = int(max_results)
+    key = (_normalize(query), max_results)
+    cached = _results.get(key)
+    if cached is not None:
+        annotate(cache="hit")
+        return cached
+
+    with _inflight_lock:
+        pending = _inflight.get(key)
+        if pending is None:
+            pending = Future()
+            _inflight[key] = pending
+            leader = True
+        else:
+            leader = False
+    if not leader:
+        annotate(cache="joined")
+        return pending.result()
+
+    annotate(cache="miss")
+    try:
+        result = _search(query, max_results)
+        if not result.startswith("Error"):
+            _results.set(key, result)
+        pending.set_result(result)
+        return result
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+def _search(query: str, max_results: int) -> str:
+    logger.debug("Searching for '%s'...", query)
     try:
-        results = DDGS().text(query, max_results=max_results)
+        results = _client().text(query, max_results=max_results)
         if not results:
             return "No results found."
-        
+
         formatted_results = []
         for i, res in enumerate(results, 1):
             title = res.get('title', 'No Title')
             href = res.get('href', '#')
             body = res.get('body', 'No description available.')
             formatted_results.append(f"{i}. [{title}]({href})\n   {body}")
-            
+
         return "\n\n".join(formatted_results)
     except Exception as e:
+        # A broken session shouldn't poison this thread's client for later calls
+        _local.ddgs = None
         return f"Error performing web search: {str(e)}"
 
 if __name__ == "__main__":
@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from src.utils import metrics
+
+CACHE_DB_PATH = os.path.expanduser(os.getenv("TINKER_CACHE_DB", "~/.tinker_cache.db"))
+
+def make_key(*parts) -> str:
+    """Stable content hash for anything JSON-serializable (model, messages, params...)."""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache with an optional TTL per entry."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict() # key -> (expires_at or None, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > time.time():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl_seconds: float = None):
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class PersistentCache:
+    """
+    Two-level string cache: an in-memory LRU in front of a SQLite table.
+    Entries expire after `ttl_seconds`; the table is trimmed to `max_entries`
+    (least recently used first) so it can't grow without bound.
+    """
+    _instance = None
+
+    def __init__(self, path: str = CACHE_DB_PATH, max_entries: int = 20000,
+                 memory_entries: int = 512, ttl_seconds: float = 7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.memory = LRUCache(max_entries=memory_entries, ttl_seconds=ttl_seconds)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT,
+                expires_at REAL,
+                accessed_at REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)")
+        self._conn.commit()
+
+    @classmethod
+    def get_instance(cls):
+        """Shared cache for LLM responses (intent classification, summaries...)."""
+        if cls._instance is None:
+            cls._instance = PersistentCache(
+                ttl_seconds=float(os.getenv("TINKER_LLM_CACHE_TTL", str(7 * 24 * 3600))),
+                max_entries=int(os.getenv("TINKER_LLM_CACHE_SIZE", "20000")),
+            )
+        return cls._instance
+
+    def get(self, key: str):
+        value = self.memory.get(key)
+        if value is not None:
+            metrics.CACHE_LOOKUPS.inc(result="memory")
+            return value
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                metrics.CACHE_LOOKUPS.inc(result="miss")
+                return None
+            if row[1] is not None and row[1] <= now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+                metrics.CACHE_LOOKUPS.inc(result="miss")
+                return None
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        metrics.CACHE_LOOKUPS.inc(result="disk")
+        self.memory.set(key, row[0], ttl_seconds=(row[1] - now) if row[1] else None)
+        return row[0]
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        expires_at = now + self.ttl_seconds if self.ttl_seconds else None
+        self.memory.set(key, value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now),
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        self._conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        self._conn.execute("""
+            DELETE FROM cache WHERE key IN (
+                SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,))
+
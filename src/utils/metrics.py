@@ -0,0 +1,197 @@
+import os
+import asyncio
+import threading
+
+# Upper bounds (seconds) of every latency histogram (spans included); sized around the 45s task target
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 45.0, 60.0, float("inf"))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def expose(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """A value that goes up and down; pass `fn` to read it at scrape time instead of setting it."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), fn=None):
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def expose(self) -> list:
+        if self.fn is not None:
+            try:
+                self.set(self.fn())
+            except Exception as e:
+                print(f"[Metrics] Gauge {self.name} failed: {e}")
+        return super().expose()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = buckets
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def expose(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = [(key, (list(e[0]), e[1], e[2])) for key, e in self._values.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+
+    def expose(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Recorded by the agent, tools, rate limiter, LLM gateway and interfaces
+MESSAGES = Counter("tinker_messages_total", "Messages received by an interface.", ("interface",))
+TASK_SECONDS = Histogram("tinker_task_duration_seconds", "End-to-end time to answer a message, queue wait included.", ("intent",))
+RATE_LIMITED = Counter("tinker_rate_limited_total", "Messages rejected by the per-user rate limiter.")
+TOOL_SECONDS = Histogram("tinker_tool_duration_seconds", "Tool execution time.", ("tool",))
+TOOL_ERRORS = Counter("tinker_tool_errors_total", "Tool calls that errored or timed out.", ("tool",))
+LLM_REQUESTS = Counter("tinker_llm_requests_total", "Successful LLM API calls.", ("provider", "model"))
+LLM_ERRORS = Counter("tinker_llm_errors_total", "Failed LLM API attempts (including ones that were retried).", ("provider", "model"))
+LLM_SECONDS = Histogram("tinker_llm_request_duration_seconds", "LLM API call latency for complete (non-streamed) responses.", ("provider", "model"))
+LLM_FIRST_CHUNK_SECONDS = Histogram("tinker_llm_first_chunk_seconds", "Time until a streamed LLM response's first chunk.", ("provider", "model"))
+LLM_RETRIES = Counter("tinker_llm_retries_total", "LLM API attempts retried after a retryable error.", ("provider", "model"))
+LLM_HEDGES = Counter("tinker_llm_hedges_total", "Requests also sent to the fallback because the primary was slow or failed.", ("provider", "model"))
+LLM_TOKENS = Counter("tinker_llm_tokens_total", "Tokens (prompt + completion) reported by the provider.", ("provider", "model"))
+# Recorded by the tracer for every finished span, when tracing is on
+FETCHES = Counter("tinker_fetches_total", "Pages read by fetch_page, by the path that served them (http or browser).", ("via",))
+FETCH_ERRORS = Counter("tinker_fetch_errors_total", "fetch_page calls that failed even in the browser.")
+CACHE_LOOKUPS = Counter("tinker_llm_cache_lookups_total", "LLM response cache lookups, by where they were answered (memory, disk or miss).", ("result",))
+MODEL_STEPS = Counter("tinker_model_steps_total", "Agent steps run per model tier (escalation re-runs included).", ("tier",))
+MODEL_ESCALATIONS = Counter("tinker_model_escalations_total", "Small-model steps re-run on the large model.")
+
+SPAN_SECONDS = Histogram("tinker_span_duration_seconds", "Duration of traced spans.", ("span",))
+SPAN_ERRORS = Counter("tinker_span_errors_total", "Traced spans that ended with an exception.", ("span",))
+# Read at scrape time; main() points them at the agent's worker pool
+POOL_WAITING = Gauge("tinker_pool_waiting_tasks", "Messages queued for a worker slot.")
+POOL_IN_FLIGHT = Gauge("tinker_pool_in_flight_tasks", "Messages currently being processed.")
+
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5.0)
+        # Drain headers; nothing in them matters here
+        while (await asyncio.wait_for(reader.readline(), timeout=5.0)) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request_line.decode("latin-1").split()
+        path = parts[1].split("?")[0] if len(parts) > 1 else "/"
+        if path == "/metrics":
+            status, content_type, body = "200 OK", "text/plain; version=0.0.4; charset=utf-8", REGISTRY.expose()
+        elif path == "/healthz":
+            status, content_type, body = "200 OK", "text/plain; charset=utf-8", "ok\n"
+        else:
+            status, content_type, body = "404 Not Found", "text/plain; charset=utf-8", "not found\n"
+        payload = body.encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(payload)}\r\n"
+            f"Connection: close\r\n\r\n".encode("latin-1") + payload
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(port: int = None, host: str = None):
+    """
+    Serves /metrics (Prometheus text format) and /healthz on the running event loop.
+    Returns the asyncio server; close it on shutdown.
+    """
+    port = port if port is not None else int(os.getenv("METRICS_PORT", "9100"))
+    host = host or os.getenv("METRICS_HOST", "0.0.0.0")
+    server = await asyncio.start_server(_handle, host, port)
+    print(f"[Metrics] Serving /metrics and /healthz on {host}:{port}")
+    return server
@@ -1,28 +1,120 @@
+import os
 import time
-from collections import defaultdict, deque
+import sqlite3
+import threading
+
+RATE_LIMIT_DB = os.path.expanduser(os.getenv("RATE_LIMIT_DB", "~/.tinker_ratelimit.db"))
+
+
+class MemoryBackend:
+    """Per-process state: one float (the theoretical arrival time) per active key."""
+
+    def __init__(self):
+        self._tat = {}
+        self._lock = threading.Lock()
+
+    def update(self, key: str, decide) -> bool:
+        """Atomically applies `decide(tat) -> (allowed, new_tat)` to the key's state."""
+        with self._lock:
+            allowed, tat = decide(self._tat.get(key))
+            self._tat[key] = tat
+            return allowed
+
+    def evict(self, now: float):
+        """Drops keys whose quota has fully recovered; they'd start fresh anyway."""
+        with self._lock:
+            for key in [k for k, tat in self._tat.items() if tat <= now]:
+                del self._tat[key]
+
+    def __len__(self):
+        return len(self._tat)
+
+
+class SQLiteBackend:
+    """
+    State in a SQLite file, so several Tinker worker processes share one quota.
+    Each check is a single BEGIN IMMEDIATE transaction (read, decide, write).
+    """
+
+    def __init__(self, path: str = RATE_LIMIT_DB):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; transactions are opened explicitly below
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def update(self, key: str, decide) -> bool:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tat FROM rate_limits WHERE key = ?", (key,)).fetchone()
+            allowed, tat = decide(row[0] if row else None)
+            conn.execute("INSERT OR REPLACE INTO rate_limits (key, tat) VALUES (?, ?)", (key, tat))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed
+
+    def evict(self, now: float):
+        self._conn().execute("DELETE FROM rate_limits WHERE tat <= ?", (now,))
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM rate_limits").fetchone()[0]
+
+
+def make_backend():
+    """RATE_LIMIT_BACKEND=memory (default, per process) or sqlite (shared via RATE_LIMIT_DB)."""
+    if os.getenv("RATE_LIMIT_BACKEND", "memory").lower() == "sqlite":
+        return SQLiteBackend()
+    return MemoryBackend()
+
 
 class RateLimiter:
-    def __init__(self, max_requests: int = 5, period_seconds: int = 600):
+    """
+    Allows `max_requests` per `period_seconds` per user, using GCRA (generic cell
+    rate algorithm): each user costs one timestamp of state no matter how busy
+    they are. A full burst is available up front. After that, capacity comes back
+    steadily, one request every period / max_requests.
+
+    Keys whose quota has fully recovered are evicted every `evict_interval` seconds.
+    `name` namespaces keys so limiters with different quotas can share a backend.
+    """
+
+    def __init__(self, max_requests: int = 5, period_seconds: int = 600, backend=None,
+                 name: str = "agent", evict_interval: float = 60.0):
         self.max_requests = max_requests
         self.period_seconds = period_seconds
-        # Dictionary to store request timestamps for each user
-        self.requests = defaultdict(deque)
+        self.backend = backend if backend is not None else make_backend()
+        self.name = name
+        self.evict_interval = evict_interval
+        # Time one request "occupies" the quota
+        self.interval = period_seconds / max_requests
+        self._next_evict = time.time() + evict_interval
 
     def is_allowed(self, user_id: str) -> bool:
         now = time.time()
-        user_requests = self.requests[user_id]
-
-        # Remove requests older than the period
-        while user_requests and user_requests[0] < now - self.period_seconds:
-            user_requests.popleft()
 
-        # Check if limit reached
-        if len(user_requests) >= self.max_requests:
-            return False
+        def decide(tat):
+            tat = max(tat or now, now) + self.interval
+            if tat - now > self.period_seconds:
+                return False, tat - self.interval # Rejected requests don't use up quota
+            return True, tat
 
-        # Add new request
-        user_requests.append(now)
-        return True
+        allowed = self.backend.update(f"{self.name}:{user_id}", decide)
+        if now >= self._next_evict:
+            self._next_evict = now + self.evict_interval
+            self.backend.evict(now)
+        return allowed
 
     def toggle_limit(self, user_id: str, active: bool):
        # Optional: Manual override if needed
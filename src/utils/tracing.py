@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import atexit
+import secrets
+import threading
+import contextvars
+from contextlib import contextmanager
+from src.utils import metrics
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation. Use as a context manager; attributes can be added while it runs."""
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent", "parent_id", "attrs",
+                 "start", "wall_start", "duration_ms", "paused_s", "error", "_token")
+
+    def __init__(self, tracer, name: str, parent, attrs: dict):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(8)
+        self.span_id = secrets.token_hex(4)
+        self.parent = parent
+        self.parent_id = parent.span_id if parent else None
+        self.attrs = attrs
+        self.error = None
+        self.duration_ms = None
+        self.paused_s = 0.0
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    @contextmanager
+    def paused(self):
+        """
+        Leaves the enclosed time out of the span. Wrap an async generator's `yield` in it:
+        the consumer's work between events is then neither timed as part of this span
+        nor parented to it.
+        """
+        started = time.perf_counter()
+        _current_span.set(self.parent)
+        try:
+            yield
+        finally:
+            _current_span.set(self)
+            self.paused_s += time.perf_counter() - started
+
+    def __enter__(self):
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration_ms = (time.perf_counter() - self.start - self.paused_s) * 1000
+        if self.paused_s:
+            self.attrs["paused_ms"] = round(self.paused_s * 1000, 3)
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit):
+            self.error = f"{exc_type.__name__}: {exc}"
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Exited from another context (e.g. an async generator closed elsewhere)
+            pass
+        self.tracer._finish(self)
+        return False
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+            "name": self.name, "start": round(self.wall_start, 6), "duration_ms": round(self.duration_ms, 3),
+            "attrs": self.attrs, "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Returned while tracing is off: entering, exiting, `set` and `paused` do nothing."""
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def paused(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """
+    Records each finished span in the tinker_span_duration_seconds histogram and, if
+    `path` is set, appends it as a JSON line (buffered, flushed when a trace's root
+    span ends and at exit).
+
+    Off unless TINKER_TRACE is set; disabled, `span()` returns a shared no-op
+    object, so instrumented code pays one attribute check per span.
+    """
+
+    def __init__(self, enabled: bool = None, path: str = None, buffer_size: int = 256):
+        self.enabled = enabled if enabled is not None else os.getenv("TINKER_TRACE", "").lower() in ("1", "true")
+        self.path = path if path is not None else os.path.expanduser(os.getenv("TINKER_TRACE_FILE", "~/.tinker_traces.jsonl"))
+        self.buffer_size = buffer_size
+        self._buffer = []
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def span(self, name: str, **attrs):
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, _current_span.get(), attrs)
+
+    def _finish(self, span: Span):
+        metrics.SPAN_SECONDS.observe(span.duration_ms / 1000, span=span.name)
+        if span.error is not None:
+            metrics.SPAN_ERRORS.inc(span=span.name)
+        with self._lock:
+            if self.path:
+                self._buffer.append(span.to_dict())
+            flush = len(self._buffer) >= self.buffer_size or (span.parent_id is None and self._buffer)
+        if flush:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+        if not lines:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(line, default=str) + "\n" for line in lines))
+
+
+tracer = Tracer()
+
+def span(name: str, **attrs):
+    """Starts a span under the current one: `with span("tool", tool=name) as s: ...`."""
+    return tracer.span(name, **attrs)
+
+def annotate(**attrs):
+    """Adds attributes (cache hits, token counts...) to whatever span is current, if any."""
+    current = _current_span.get()
+    if current is not None:
+        current.attrs.update(attrs)
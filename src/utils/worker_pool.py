@@ -0,0 +1,112 @@
+import os
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from src.utils.tracing import span
+
+
+class WorkerPool:
+    """
+    Runs blocking agent work (Groq calls, sync tools) off the asyncio event loop.
+
+    Two limits apply to admitted tasks:
+    - a global cap on how many tasks run at once (AGENT_MAX_CONCURRENT_TASKS)
+    - a per-user cap (AGENT_MAX_TASKS_PER_USER) so one user can't take every slot
+    Tasks over either limit wait their turn instead of blocking the loop.
+    """
+
+    def __init__(self, max_tasks: int = None, max_per_user: int = None, max_threads: int = None):
+        self.max_tasks = max_tasks or int(os.getenv("AGENT_MAX_CONCURRENT_TASKS", "4"))
+        self.max_per_user = max_per_user or int(os.getenv("AGENT_MAX_TASKS_PER_USER", "1"))
+        # Threads outnumber task slots: one admitted task may have several
+        # blocking calls in flight (LLM call + sync tools).
+        max_threads = max_threads or int(os.getenv("AGENT_THREAD_POOL_SIZE", str(self.max_tasks * 4)))
+        self._executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="tinker-worker")
+        self._global_slots = asyncio.Semaphore(self.max_tasks)
+        self._loop = None
+        # user_id -> [semaphore, number of tasks holding or waiting on it]
+        self._user_slots = {}
+        self.in_flight = 0
+        self.waiting = 0
+
+    async def run(self, user_id: str, func, *args, **kwargs):
+        """
+        Runs a blocking function for a user once a per-user and a global slot are free.
+        """
+        async with self.slot(user_id):
+            return await self.run_blocking(func, *args, **kwargs)
+
+    async def run_blocking(self, func, *args, **kwargs):
+        """
+        Runs a blocking function on the thread pool without admission control.
+        Context variables (e.g. the current user for memory tools) are carried over.
+        """
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        call = functools.partial(ctx.run, func, *args, **kwargs)
+        return await loop.run_in_executor(self._executor, call)
+
+    def slot(self, user_id: str):
+        """Async context manager holding one per-user and one global slot."""
+        return _Slot(self, user_id)
+
+    async def _acquire(self, user_id: str):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop and self.in_flight == 0 and self.waiting == 0:
+            # Sync callers use a fresh loop per asyncio.run(); rebind while idle.
+            self._loop = loop
+            self._global_slots = asyncio.Semaphore(self.max_tasks)
+
+        entry = self._user_slots.get(user_id)
+        if entry is None:
+            entry = [asyncio.Semaphore(self.max_per_user), 0]
+            self._user_slots[user_id] = entry
+        entry[1] += 1
+
+        self.waiting += 1
+        try:
+            # Per-user first, so a user's queued tasks never hold global slots.
+            await entry[0].acquire()
+            try:
+                await self._global_slots.acquire()
+            except BaseException:
+                entry[0].release()
+                raise
+        except BaseException:
+            self._drop_user(user_id, entry)
+            raise
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+
+    def _release(self, user_id: str):
+        self.in_flight -= 1
+        self._global_slots.release()
+        entry = self._user_slots[user_id]
+        entry[0].release()
+        self._drop_user(user_id, entry)
+
+    def _drop_user(self, user_id: str, entry: list):
+        entry[1] -= 1
+        if entry[1] == 0:
+            # Nobody holds or waits on this user's slot; forget it to bound memory.
+            self._user_slots.pop(user_id, None)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class _Slot:
+    def __init__(self, pool: WorkerPool, user_id: str):
+        self.pool = pool
+        self.user_id = user_id
+
+    async def __aenter__(self):
+        with span("pool.wait", waiting=self.pool.waiting, in_flight=self.pool.in_flight):
+            await self.pool._acquire(self.user_id)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.pool._release(self.user_id)
+        return False
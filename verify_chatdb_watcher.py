@@ -0,0 +1,106 @@
+import os
+import sys
+import time
+import sqlite3
+import asyncio
+import tempfile
+from src.interfaces import chatdb_watcher
+from src.interfaces.imessage import IMessageInterface
+from src.interfaces.imessage_sender import SendQueue, StubRunner
+
+# The parts of Messages' chat.db schema that the interface reads
+SCHEMA = """
+    CREATE TABLE handle (ROWID INTEGER PRIMARY KEY, id TEXT);
+    CREATE TABLE message (ROWID INTEGER PRIMARY KEY, text TEXT, handle_id INTEGER, is_from_me INTEGER);
+    CREATE TABLE chat_message_join (chat_id INTEGER, message_id INTEGER);
+    INSERT INTO handle (ROWID, id) VALUES (1, '+15550001');
+"""
+
+
+class RecordingInterface(IMessageInterface):
+    """Records triggered messages instead of running the agent."""
+
+    def __init__(self, db_path):
+        super().__init__(agent=None, db_path=db_path, sender=SendQueue(runner=StubRunner()))
+        self.received = asyncio.Queue()
+
+    async def _process_message(self, text, sender, chat_id=None, msg_id=None):
+        self.received.put_nowait((time.monotonic(), text))
+
+
+def make_chat_db(directory):
+    path = os.path.join(directory, "chat.db")
+    writer = sqlite3.connect(path)
+    writer.execute("PRAGMA journal_mode=WAL")
+    writer.executescript(SCHEMA)
+    writer.commit()
+    return path, writer
+
+
+def insert_message(writer, text):
+    cur = writer.execute("INSERT INTO message (text, handle_id, is_from_me) VALUES (?, 1, 0)", (text,))
+    writer.execute("INSERT INTO chat_message_join (chat_id, message_id) VALUES (1, ?)", (cur.lastrowid,))
+    writer.commit()
+    return time.monotonic()
+
+
+async def run_interface(iface, writer, timeout):
+    task = asyncio.create_task(iface.start())
+    # Let the first query run and the loop settle into watcher.wait()
+    await asyncio.sleep(0.3)
+    try:
+        written = insert_message(writer, "@Tinker hello")
+        received, text = await asyncio.wait_for(iface.received.get(), timeout=timeout)
+        assert text == "@Tinker hello"
+        return iface.watcher.mode, received - written
+    finally:
+        await iface.stop()
+        task.cancel()
+
+
+async def test_file_watch_wakes_interface():
+    print("Testing a new chat.db row with file watching...")
+    if not sys.platform.startswith("linux"):
+        print("⚠️ Skipped: inotify is Linux-only.")
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        path, writer = make_chat_db(directory)
+        mode, latency = await run_interface(RecordingInterface(path), writer, timeout=2.0)
+        writer.close()
+    # Well inside the 30s safety re-check and the 0.1s+ poll backoff: woken by inotify
+    assert mode == "inotify", mode
+    assert latency < 1.0, latency
+    print(f"✅ Message picked up by inotify in {latency * 1000:.0f}ms.")
+
+
+async def test_poll_fallback():
+    print("\nTesting the polling fallback when inotify is unavailable...")
+
+    class Unavailable:
+        def __init__(self, db_path):
+            raise OSError(38, "inotify_init1 failed")
+
+    original = chatdb_watcher._InotifyBackend
+    chatdb_watcher._InotifyBackend = Unavailable
+    original_kqueue = chatdb_watcher._KqueueBackend
+    chatdb_watcher._KqueueBackend = Unavailable
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            path, writer = make_chat_db(directory)
+            # Worst case: the poll interval has backed off to max_interval (5s)
+            mode, latency = await run_interface(RecordingInterface(path), writer, timeout=8.0)
+            writer.close()
+    finally:
+        chatdb_watcher._InotifyBackend = original
+        chatdb_watcher._KqueueBackend = original_kqueue
+    assert mode == "poll", mode
+    print(f"✅ Message picked up by polling in {latency * 1000:.0f}ms.")
+
+
+async def main():
+    await test_file_watch_wakes_interface()
+    await test_poll_fallback()
+    print("\n✅ chat.db Watcher Verification Passed!")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,74 @@
+import sys
+import asyncio
+import subprocess
+from src.interfaces.imessage_sender import OsascriptRunner
+
+# Stand-ins for `osascript -i`: one answers each send line with its marker, one never answers
+ANSWERING_REPL = r"""
+import re, sys
+for line in sys.stdin:
+    seq = re.search(r"TINKER_SEND (\d+) OK", line).group(1)
+    print(f"TINKER_SEND {seq} OK", flush=True)
+"""
+HUNG_REPL = "import sys, time\nsys.stdin.readline()\ntime.sleep(60)"
+
+
+class FakeRunner(OsascriptRunner):
+    def __init__(self, scripts, **kwargs):
+        super().__init__(**kwargs)
+        self.scripts = list(scripts)
+        self.spawned = 0
+
+    async def _spawn(self):
+        self.spawned += 1
+        script = self.scripts.pop(0) if self.scripts else ANSWERING_REPL
+        return await asyncio.create_subprocess_exec(
+            sys.executable, "-c", script,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        )
+
+
+async def test_hung_repl_is_replaced():
+    print("Testing a hung REPL with another send queued...")
+    runner = FakeRunner([HUNG_REPL], processes=1, timeout=0.5)
+
+    first = asyncio.create_task(runner.send("+15550001", "first"))
+    second = asyncio.create_task(runner.send("+15550002", "second"))
+
+    try:
+        await first
+        assert False, "the hung REPL should have timed out"
+    except asyncio.TimeoutError:
+        pass
+    # The queued send must get a fresh REPL instead of waiting forever
+    await asyncio.wait_for(second, timeout=5.0)
+    assert runner.spawned == 2
+    await runner.close()
+    print("✅ Queued send went out on a fresh REPL.")
+
+
+async def test_dead_repl_is_replaced():
+    print("\nTesting a REPL that exits mid-send...")
+    runner = FakeRunner(["import sys\nsys.stdin.readline()"], processes=1, timeout=5.0)
+
+    first = asyncio.create_task(runner.send("+15550001", "first"))
+    second = asyncio.create_task(runner.send("+15550002", "second"))
+
+    try:
+        await first
+        assert False, "the exited REPL should have failed the send"
+    except RuntimeError as e:
+        assert "exited" in str(e)
+    await asyncio.wait_for(second, timeout=5.0)
+    assert runner.spawned == 2
+    await runner.close()
+    print("✅ Queued send survived the REPL exiting.")
+
+
+async def main():
+    await test_hung_repl_is_replaced()
+    await test_dead_repl_is_replaced()
+    print("\n✅ iMessage Sender Verification Passed!")
+
+if __name__ == "__main__":
+    asyncio.run(main())
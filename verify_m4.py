@@ -40,6 +40,17 @@ def test_memory():
     val = MemoryManager.get_instance().get_pref(user_id, key)
     assert val == "blue"
 
+    # Test 5: A missing key must not be answered with a different fact
+    print("\n[5] Testing Recall Doesn't Substitute Another Fact...")
+    set_current_user("test_user_recall")
+    remember("favorite_food", "pizza")
+    wrong = recall("favorite_color")
+    print(f"Result: {wrong}")
+    assert "pizza" not in wrong
+    close = recall("Favorite Food")
+    print(f"Result: {close}")
+    assert "Closest stored memory: favorite_food: pizza" in close
+
     print("\n✅ M4 Verification Passed!")
 
 if __name__ == "__main__":